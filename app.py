@@ -1,17 +1,54 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, make_response, render_template, request, send_from_directory
+from werkzeug.http import is_resource_modified
+import hashlib
 import json
 import os
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from article_store import ArticleStore
+from near_duplicate import drop_near_duplicates
+from search_index import document_text, normalize
 
 app = Flask(__name__)
 
+JSON_PATH = "news_articles.json"
+DB_PATH = os.environ.get("NEWS_DB_PATH", "news_articles.sqlite3")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+PAGE_CACHE_SIZE = 128
 
-def load_articles(json_path: str = "news_articles.json"):
-    if not os.path.exists(json_path):
-        return []
+# データファイルの (mtime, サイズ) をキーにしたキャッシュ（ファイルが変わるまで再計算しない）
+_cache_lock = threading.Lock()
+_data_cache = {}
+_page_cache = OrderedDict()
+
+
+def file_signature(path: str):
+    """ファイルの (更新時刻ns, サイズ)。ファイルがなければNone"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _cached(key, signature, build):
+    with _cache_lock:
+        cached = _data_cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+    value = build()
+    with _cache_lock:
+        _data_cache[key] = (signature, value)
+    return value
+
+
+def _read_articles(json_path: str):
     try:
         with open(json_path, "r", encoding="utf-8") as f:
             data = json.load(f)
@@ -22,9 +59,14 @@ def load_articles(json_path: str = "news_articles.json"):
         return []
 
 
-@app.route("/")
-def index():
-    articles = load_articles()
+def load_articles(json_path: str = JSON_PATH):
+    signature = file_signature(json_path)
+    if signature is None:
+        return []
+    return _cached(("articles", json_path), signature, lambda: _read_articles(json_path))
+
+
+def sort_articles(articles):
     # 最新順に並べ替え（scraped_atがある場合）
     def sort_key(a):
         ts = a.get("scraped_at") or ""
@@ -33,8 +75,101 @@ def index():
         except Exception:
             return datetime.min
 
-    articles_sorted = sorted(articles, key=sort_key, reverse=True)
-    return render_template("index.html", articles=articles_sorted)
+    return sorted(articles, key=sort_key, reverse=True)
+
+
+def load_sorted_articles(json_path: str = JSON_PATH):
+    signature = file_signature(json_path)
+    if signature is None:
+        return []
+    return _cached(("sorted", json_path), signature, lambda: unique_articles(sort_articles(load_articles(json_path))))
+
+
+def unique_articles(sorted_articles):
+    # データベースと同じく先に取得した記事を残し、ほぼ同じ内容の転載記事は表示しない
+    return drop_near_duplicates(sorted_articles[::-1])[::-1]
+
+
+def data_source():
+    """表示に使うデータファイルとその (更新時刻ns, サイズ)"""
+    signature = file_signature(DB_PATH)
+    if signature is not None:
+        return DB_PATH, signature
+    return JSON_PATH, file_signature(JSON_PATH)
+
+
+def page_args():
+    """?page= と ?limit= を取得（範囲外の値は丸める）"""
+    page = max(request.args.get("page", 1, type=int) or 1, 1)
+    limit = request.args.get("limit", DEFAULT_LIMIT, type=int) or DEFAULT_LIMIT
+    return page, min(max(limit, 1), MAX_LIMIT)
+
+
+def fetch_page(page: int, limit: int, query: str = None):
+    """1ページ分の記事と総件数を取得（データベースがなければJSONから）"""
+    offset = (page - 1) * limit
+    if os.path.exists(DB_PATH):
+        with ArticleStore(DB_PATH, readonly=True) as store:
+            if query is not None:
+                return store.search(query, limit, offset)
+            return store.recent(limit, offset), store.count()
+    articles = load_sorted_articles()
+    if query is not None:
+        terms = normalize(query).split()
+        articles = [a for a in articles if terms and all(t in document_text(a) for t in terms)]
+    return articles[offset:offset + limit], len(articles)
+
+
+def render_index(source: str, signature, page: int, limit: int, query: str = None):
+    """一覧・検索結果のページを描画（データファイルが変わるまで描画結果を使い回す）"""
+    key = (source, signature, page, limit, query)
+    with _cache_lock:
+        html = _page_cache.get(key)
+        if html is not None:
+            _page_cache.move_to_end(key)
+            return html
+    articles, total = fetch_page(page, limit, query)
+    pages = max((total + limit - 1) // limit, 1)
+    html = render_template("index.html", articles=articles, total=total, page=page, pages=pages, limit=limit,
+                           query=query)
+    with _cache_lock:
+        _page_cache[key] = html
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    return html
+
+
+def conditional_page(page: int, limit: int, query: str = None):
+    source, signature = data_source()
+    # データファイルが変わっていなければ 304 を返せるよう ETag / Last-Modified を付ける
+    mtime_ns, size = signature or (0, 0)
+    tag = f"{mtime_ns:x}-{size:x}-{page}-{limit}"
+    if query is not None:
+        tag += "-" + hashlib.sha1(query.encode("utf-8")).hexdigest()[:16]
+    last_modified = datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc) if signature else None
+    if is_resource_modified(request.environ, etag=tag, last_modified=last_modified):
+        response = make_response(render_index(source, signature, page, limit, query))
+    else:
+        # 304 ならデータベースの読み出しやテンプレートの描画をしない
+        response = make_response("", 304)
+    response.set_etag(tag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route("/")
+def index():
+    page, limit = page_args()
+    return conditional_page(page, limit)
+
+
+@app.route("/search")
+def search():
+    page, limit = page_args()
+    query = request.args.get("q", "").strip()
+    return conditional_page(page, limit, query)
 
 
 @app.route("/favicon.ico")
@@ -44,5 +179,3 @@ def favicon():
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
-
-
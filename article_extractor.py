@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+lxmlのツリーを1回走査して記事情報を抽出するエクストラクター
+
+HeadExtractor は届いた分から <head> だけを解析し、本文を待たずにタイトル・説明・公開日時を取り出す。
+"""
+
+import codecs
+import re
+
+from lxml import etree
+
+# 日付として扱うパターン（先にあるものを優先）
+DATE_PATTERNS = [
+    r'\d{4}年\d{1,2}月\d{1,2}日',
+    r'\d{4}-\d{1,2}-\d{1,2}',
+    r'\d{4}/\d{1,2}/\d{1,2}',
+    r'\d{1,2}/\d{1,2}/\d{4}',
+]
+
+# 本文を探すセレクター（先にあるものを優先）
+DEFAULT_CONTENT_SELECTORS = [
+    'article',
+    '.content',
+    '.post-content',
+    '.entry-content',
+    '.article-body',
+    'main',
+    'p',
+]
+
+# BeautifulSoupと同様、これらの要素内の文字列は別扱いにして get_text() に含めない
+_STRING_CONTAINER_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+# 空白だけの文字列をまとめない要素
+_PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+_ASCII_SPACES = ' \n\t\x0c\r'
+
+# 公開日時を書くmetaタグ（property / name / itemprop の値。先にあるものを優先）
+PUBLISHED_META = [
+    'article:published_time',
+    'og:article:published_time',
+    'datepublished',
+    'pubdate',
+    'date',
+]
+
+# 文字列の先頭のXML宣言（古いXHTMLのページ。lxmlは encoding 宣言付きの文字列を解析できない）
+_XML_DECLARATION = re.compile(r'^\ufeff?\s*<\?xml[^>]*\?>')
+
+_COMPILED_DATE_PATTERNS = [re.compile(pattern) for pattern in DATE_PATTERNS]
+_SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$')
+
+
+def strip_xml_declaration(html):
+    """文字列のHTMLの先頭にXML宣言があれば除く（バイト列はlxmlが宣言の文字コードで読むのでそのまま）"""
+    if isinstance(html, str):
+        return _XML_DECLARATION.sub('', html, count=1)
+    return html
+
+
+def parse_selector(selector):
+    """「tag」「.class」「#id」とその組み合わせだけの単純なセレクターを解析
+
+    単純なセレクターでなければNoneを返す。
+    """
+    match = _SIMPLE_SELECTOR.match(selector.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    tag = match.group(1).lower() if match.group(1) else None
+    parts = re.findall(r'([.#])([\w-]+)', match.group(2))
+    classes = frozenset(name for kind, name in parts if kind == '.')
+    ids = [name for kind, name in parts if kind == '#']
+    if len(ids) > 1:
+        return None
+    return tag, classes, ids[0] if ids else None
+
+
+class ArticleExtractor:
+    """タイトル・見出し・説明・日付・本文をlxmlツリーの1回の走査で集める
+
+    結果は NewsScraper がBeautifulSoupで行っていた抽出と同じ値になる。
+    content_selectors には単純なセレクター（tag / .class / #id の組み合わせ）を指定できる。
+    """
+
+    def __init__(self, content_selectors=None, min_content_length=100):
+        self.content_selectors = list(content_selectors or DEFAULT_CONTENT_SELECTORS)
+        self.min_content_length = min_content_length
+        self._selectors = []
+        for selector in self.content_selectors:
+            parsed = parse_selector(selector)
+            if parsed is None:
+                raise ValueError(f"サポートしていないセレクター: {selector}")
+            self._selectors.append(parsed)
+
+    def parse(self, html):
+        """HTML文字列（またはバイト列）をlxmlのツリーにする"""
+        if not html:
+            return None
+        parser = etree.HTMLParser(recover=True)
+        return etree.fromstring(strip_xml_declaration(html), parser)
+
+    def extract(self, html):
+        """HTMLから title / h1 / description / date / content を抽出"""
+        root = self.parse(html) if isinstance(html, (str, bytes)) else html
+        if root is None:
+            return self._result('', None, None, None, [None] * len(self._selectors))
+
+        chunks = []      # 文書内の文字列（出現順）
+        kinds = []       # 各文字列を囲む最も内側の特別な要素（script等）、なければNone
+        ranges = {}      # 要素 -> chunks中の (開始, 終了)
+        title = h1 = None
+        description = None
+        content_elements = [None] * len(self._selectors)
+        containers = []
+        preserve_depth = 0
+
+        def add_text(text):
+            # BeautifulSoupと同様、空白だけの文字列は改行か空白1つにまとめる
+            if not preserve_depth and not text.strip(_ASCII_SPACES):
+                text = '\n' if '\n' in text else ' '
+            chunks.append(text)
+            kinds.append(containers[-1] if containers else None)
+
+        stack = [(root, False)]
+        while stack:
+            element, closing = stack.pop()
+            tag = element.tag
+
+            if not isinstance(tag, str):
+                # コメントや処理命令は本文に含めず、直後のテキストだけ拾う
+                if element.tail:
+                    add_text(element.tail)
+                continue
+
+            if closing:
+                if element in ranges:
+                    ranges[element] = (ranges[element], len(chunks))
+                if tag in _STRING_CONTAINER_TAGS:
+                    containers.pop()
+                if tag in _PRESERVE_WHITESPACE_TAGS:
+                    preserve_depth -= 1
+                if element.tail:
+                    add_text(element.tail)
+                continue
+
+            tracked = False
+            if tag == 'title' and title is None:
+                title = element
+                tracked = True
+            elif tag == 'h1' and h1 is None:
+                h1 = element
+                tracked = True
+            elif tag == 'meta' and description is None and element.get('name') == 'description':
+                description = element.get('content', '')
+
+            classes = None
+            for i, (sel_tag, sel_classes, sel_id) in enumerate(self._selectors):
+                if content_elements[i] is not None:
+                    continue
+                if sel_tag and sel_tag != tag:
+                    continue
+                if sel_id and element.get('id') != sel_id:
+                    continue
+                if sel_classes:
+                    if classes is None:
+                        classes = set(element.get('class', '').split())
+                    if not sel_classes <= classes:
+                        continue
+                content_elements[i] = element
+                tracked = True
+
+            if tracked:
+                ranges[element] = len(chunks)
+            if tag in _STRING_CONTAINER_TAGS:
+                containers.append(tag)
+            if tag in _PRESERVE_WHITESPACE_TAGS:
+                preserve_depth += 1
+            if element.text:
+                add_text(element.text)
+
+            stack.append((element, True))
+            stack.extend((child, False) for child in reversed(element))
+
+        def text_of(element):
+            if element is None:
+                return None
+            start, end = ranges[element]
+            # script等の要素自身を指定した場合はその中の文字列だけを返す
+            kind = element.tag if element.tag in _STRING_CONTAINER_TAGS else None
+            return ''.join(chunks[i] for i in range(start, end) if kinds[i] == kind)
+
+        document_text = ''.join(chunk for chunk, kind in zip(chunks, kinds) if kind is None)
+        return self._result(document_text, text_of(title), text_of(h1), description,
+                            [text_of(element) for element in content_elements])
+
+    def _result(self, document_text, title, h1, description, contents):
+        return {
+            'title': title.strip() if title is not None else "タイトルなし",
+            'h1': h1.strip() if h1 is not None else "",
+            'description': description if description is not None else "",
+            'date': self._find_date(document_text),
+            'content': self._pick_content(contents),
+        }
+
+    @staticmethod
+    def _find_date(text):
+        for pattern in _COMPILED_DATE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return match.group()
+        return "日付不明"
+
+    def _pick_content(self, contents):
+        for text in contents:
+            if text is None:
+                continue
+            text = text.strip()
+            if len(text) > self.min_content_length:
+                return text
+        return "本文なし"
+
+
+class HeadExtractor:
+    """届いた本文を順に feed して <head> のタイトル・説明・公開日時を集める
+
+    lxmlのフィードパーサーで解析するので、本文をすべて受け取る前に結果が分かる。
+    feed() が True を返したら </head>（閉じタグがなければ <body> の開始）まで読み終えている。
+    結果は ArticleExtractor と同じ形で、見出しと本文は <body> にあるので空になる。
+    """
+
+    def __init__(self, encoding='utf-8'):
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except (LookupError, TypeError):
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._parser = etree.HTMLPullParser(events=('start', 'end'), recover=True)
+        self._title = None
+        self._meta = {}
+        self.done = False
+
+    def feed(self, data):
+        """本文の続き（バイト列）を解析し、<head> を読み終えたらTrueを返す"""
+        if not self.done:
+            self._parser.feed(self._decoder.decode(data))
+            self._read_events()
+        return self.done
+
+    def close(self):
+        """本文の終わりまで届いた場合に、残りを解析する"""
+        if not self.done:
+            self._parser.feed(self._decoder.decode(b'', final=True))
+            self._parser.close()
+            self._read_events()
+            self.done = True
+
+    def _read_events(self):
+        for event, element in self._parser.read_events():
+            tag = element.tag
+            if event == 'start':
+                if tag == 'body':
+                    self.done = True
+                    return
+                if tag == 'meta':
+                    key = element.get('property') or element.get('name') or element.get('itemprop')
+                    if key:
+                        self._meta.setdefault(key.lower(), element.get('content', ''))
+            elif tag == 'head':
+                self.done = True
+                return
+            elif tag == 'title' and self._title is None:
+                self._title = ''.join(element.itertext())
+
+    def result(self):
+        """title / h1 / description / date / content（ArticleExtractor.extract と同じキー）"""
+        meta = self._meta
+        title = self._title if self._title is not None else meta.get('og:title')
+        description = meta.get('description')
+        if description is None:
+            description = meta.get('og:description', '')
+        date = "日付不明"
+        for key in PUBLISHED_META:
+            if meta.get(key):
+                date = ArticleExtractor._find_date(meta[key])
+                if date != "日付不明":
+                    break
+        if date == "日付不明" and title:
+            date = ArticleExtractor._find_date(title)
+        return {
+            'title': title.strip() if title is not None else "タイトルなし",
+            'h1': "",
+            'description': description,
+            'date': date,
+            'content': "本文なし",
+        }
+
+
+def extract_article(html, content_selectors=None):
+    """HTMLから記事情報を抽出（ArticleExtractorの簡易版）"""
+    return ArticleExtractor(content_selectors).extract(html)
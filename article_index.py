@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+取得済み記事のインデックス（差分クロール用）
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# 内容のハッシュに含めないフィールド
+_VOLATILE_FIELDS = ('scraped_at',)
+
+
+def content_hash(article):
+    """記事の内容（取得時刻を除く）のハッシュ"""
+    payload = {k: v for k, v in article.items() if k not in _VOLATILE_FIELDS}
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ArticleIndex:
+    """正規化済みURLをキーに、内容のハッシュと最終取得時刻を保存するSQLiteのインデックス
+
+    recheck_after（秒）を過ぎた記事だけを再取得の対象にする。Noneなら既知の記事は再取得しない。
+    """
+
+    def __init__(self, path='news_index.sqlite3', recheck_after=None):
+        self.path = path
+        self.recheck_after = recheck_after
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_fetched REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def should_fetch(self, url):
+        """未知の記事か、再確認の時期を過ぎた記事ならTrue"""
+        with self._lock:
+            row = self._conn.execute("SELECT last_fetched FROM articles WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return True
+        if self.recheck_after is None:
+            return False
+        return time.time() - row[0] >= self.recheck_after
+
+    def record(self, article):
+        """取得した記事を記録し、新規または内容が変わった場合にTrueを返す"""
+        url = article['url']
+        digest = content_hash(article)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM articles WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO articles VALUES (?, ?, ?, ?)", (url, digest, now, now))
+            else:
+                self._conn.execute("UPDATE articles SET content_hash = ?, last_fetched = ? WHERE url = ?",
+                                   (digest, now, url))
+            self._conn.commit()
+        return row is None or row[0] != digest
+
+    def close(self):
+        """インデックスを閉じる"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記事を取得したそばから書き出すストリーミング出力（JSONL / CSV）と、最終的なJSON/CSVへのまとめ処理
+"""
+
+import csv
+import json
+import os
+import threading
+
+# CSVの列（news_articles.csv と同じ順序）
+ARTICLE_FIELDS = ['url', 'title', 'h1', 'description', 'date', 'content_preview', 'scraped_at']
+
+
+class _StreamSink:
+    """1件ごとにflushし、fsync_every件ごとにfsyncするファイル出力の共通部分
+
+    ファイルは最初の1件を書くときに開く。1件も書かなければ既存のファイルはそのまま残る。
+    """
+
+    def __init__(self, path, append=False, fsync_every=20, encoding='utf-8', newline=None):
+        self.path = path
+        self.append = append
+        self.fsync_every = fsync_every
+        self.count = 0
+        self._encoding = encoding
+        self._newline = newline
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _is_new(self):
+        return not (self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0)
+
+    def _open(self):
+        self._file = open(self.path, 'a' if self.append else 'w',
+                          encoding=self._encoding, newline=self._newline)
+
+    def write(self, article):
+        """記事を1件書き出す"""
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._write(article)
+            self._file.flush()
+            self.count += 1
+            if self.fsync_every and self.count % self.fsync_every == 0:
+                os.fsync(self._file.fileno())
+
+    def _write(self, article):
+        raise NotImplementedError
+
+    def close(self):
+        """残りを書き出してファイルを閉じる"""
+        with self._lock:
+            if self._file is None or self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JSONLSink(_StreamSink):
+    """1行に1記事のJSONを追記する"""
+
+    def __init__(self, path, append=True, fsync_every=20):
+        super().__init__(path, append=append, fsync_every=fsync_every)
+
+    def _write(self, article):
+        self._file.write(json.dumps(article, ensure_ascii=False) + '\n')
+
+
+class CSVSink(_StreamSink):
+    """pandasを使わずにCSVへ1行ずつ書き出す（Excelで開けるようBOM付きUTF-8）"""
+
+    def __init__(self, path, fieldnames=None, append=False, fsync_every=20):
+        super().__init__(path, append=append, fsync_every=fsync_every, newline='')
+        self.fieldnames = list(fieldnames or ARTICLE_FIELDS)
+        self._writer = None
+
+    def _open(self):
+        is_new = self._is_new()
+        self._encoding = 'utf-8-sig' if is_new else 'utf-8'
+        super()._open()
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames,
+                                      extrasaction='ignore', lineterminator='\n')
+        if is_new:
+            self._writer.writeheader()
+
+    def _write(self, article):
+        self._writer.writerow(article)
+
+
+class MultiSink:
+    """複数の出力先にまとめて書き出す"""
+
+    def __init__(self, *sinks):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def write(self, article):
+        for sink in self.sinks:
+            sink.write(article)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path):
+    """JSONLファイルの記事を1件ずつ返す（途中で切れた行は飛ばす）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def import_json(json_path, jsonl_path):
+    """従来形式のJSON（記事の配列）をJSONLに変換し、変換した件数を返す"""
+    if not os.path.exists(json_path):
+        return 0
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"読み込みエラー: {e}")
+        return 0
+    if not isinstance(articles, list):
+        return 0
+    with JSONLSink(jsonl_path, append=False, fsync_every=0) as sink:
+        for article in articles:
+            sink.write(article)
+    return len(articles)
+
+
+def format_json_item(article):
+    """json.dump(indent=2) で保存した配列の1要素分と同じ書式の文字列"""
+    text = json.dumps(article, ensure_ascii=False, indent=2)
+    return '\n'.join('  ' + line for line in text.split('\n'))
+
+
+def compact_jsonl(jsonl_path, json_path=None, csv_path=None, fieldnames=None):
+    """JSONLをURLごとに最新の1件へまとめ、従来形式のJSON/CSVに書き出す
+
+    記事は1件ずつ読み書きするため、メモリに乗るのはURLごとの行番号だけ。
+    重複があった場合はJSONL自体もまとめ直す。書き出した記事数を返す。
+    """
+    if not os.path.exists(jsonl_path):
+        return 0
+
+    # 1回目: URLごとに最後に出てきた位置を調べる
+    last_seen = {}
+    total = 0
+    for position, article in enumerate(iter_jsonl(jsonl_path)):
+        last_seen[article.get('url')] = position
+        total += 1
+    keep = set(last_seen.values())
+
+    # 2回目: 残す記事だけを書き出す（一時ファイルに書いてから置き換える）
+    outputs = []
+    json_file = csv_writer = jsonl_file = None
+    if json_path:
+        json_file = open(json_path + '.tmp', 'w', encoding='utf-8')
+        outputs.append((json_file, json_path))
+    if csv_path:
+        csv_file = open(csv_path + '.tmp', 'w', encoding='utf-8-sig', newline='')
+        csv_writer = csv.DictWriter(csv_file, fieldnames=list(fieldnames or ARTICLE_FIELDS),
+                                    extrasaction='ignore', lineterminator='\n')
+        csv_writer.writeheader()
+        outputs.append((csv_file, csv_path))
+    if len(keep) < total:
+        jsonl_file = open(jsonl_path + '.tmp', 'w', encoding='utf-8')
+        outputs.append((jsonl_file, jsonl_path))
+
+    written = 0
+    try:
+        for position, article in enumerate(iter_jsonl(jsonl_path)):
+            if position not in keep:
+                continue
+            if json_file:
+                json_file.write(('[\n' if written == 0 else ',\n') + format_json_item(article))
+            if csv_writer:
+                csv_writer.writerow(article)
+            if jsonl_file:
+                jsonl_file.write(json.dumps(article, ensure_ascii=False) + '\n')
+            written += 1
+        if json_file:
+            json_file.write('\n]' if written else '[]')
+    finally:
+        for f, _ in outputs:
+            f.close()
+    for f, path in outputs:
+        os.replace(f.name, path)
+    return written
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記事をSQLiteに保存し、新しい順にページ単位で読み出すストア
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import quote
+
+from near_duplicate import NearDuplicateIndex, fingerprint, pack, unpack
+from search_index import SearchIndex
+
+ARTICLE_COLUMNS = ['url', 'title', 'h1', 'description', 'date', 'content_preview', 'scraped_at']
+
+
+def sort_key(scraped_at):
+    """scraped_at を並べ替え用の固定長文字列にする（解釈できなければ空文字 = 最も古い）"""
+    try:
+        return datetime.fromisoformat(scraped_at or '').strftime('%Y-%m-%dT%H:%M:%S.%f')
+    except (TypeError, ValueError):
+        return ''
+
+
+class ArticleStore:
+    """URLごとに1行の記事テーブル（scraped_at の新しい順のインデックス付き）
+
+    スクレイパーからは write() で1件ずつ書き込み（出力先としても使える）、
+    app.py からは recent() で新しい順に必要な分だけ読み出す。
+    先に保存した記事とほぼ同じ内容（配信記事の転載など）の記事は duplicate_of に元の記事のURLを入れ、
+    一覧・件数・検索には含めない。
+    """
+
+    def __init__(self, path='news_articles.sqlite3', readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self.search_index = SearchIndex(self._conn, readonly=True)
+            # この機能より前に作ったデータベースには duplicate_of の列がない
+            self._has_duplicates = self._has_column('duplicate_of')
+            return
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                title TEXT,
+                h1 TEXT,
+                description TEXT,
+                date TEXT,
+                content_preview TEXT,
+                scraped_at TEXT,
+                sort_key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                fingerprint BLOB,
+                duplicate_of TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_sort_key ON articles (sort_key DESC, id)")
+        # 保存と同時に全文検索の索引も更新する
+        self.search_index = SearchIndex(self._conn)
+        self._has_duplicates = True
+        self._duplicates = None
+        if not self._has_column('duplicate_of'):
+            self._add_duplicate_columns()
+        if self.search_index.needs_rebuild():
+            self.search_index.rebuild()
+        elif self.search_index.needs_documents():
+            self.search_index.fill_documents()
+        self._conn.commit()
+
+    def _has_column(self, name):
+        return any(row[1] == name for row in self._conn.execute("PRAGMA table_info(articles)"))
+
+    def _add_duplicate_columns(self):
+        """指紋と重複の列を追加し、保存済みの記事を古い順に判定する（この機能より前に作ったデータベース）"""
+        self._conn.execute("ALTER TABLE articles ADD COLUMN fingerprint BLOB")
+        self._conn.execute("ALTER TABLE articles ADD COLUMN duplicate_of TEXT")
+        index = NearDuplicateIndex()
+        rows = self._conn.execute("SELECT id, data FROM articles ORDER BY sort_key, id").fetchall()
+        for article_id, data in rows:
+            article = json.loads(data)
+            signature = fingerprint(article)
+            original = index.check(article, signature)
+            self._conn.execute("UPDATE articles SET fingerprint = ?, duplicate_of = ? WHERE id = ?",
+                               (pack(signature) if signature else None, original, article_id))
+            if original:
+                self.search_index.remove_article(article_id)
+        self._duplicates = index
+
+    def _duplicate_index(self):
+        # 重複の判定に使う索引は、最初に書き込むときに保存済みの指紋から作る
+        if self._duplicates is None:
+            self._duplicates = NearDuplicateIndex()
+            self._duplicates.add_many(self._fingerprint_rows())
+        return self._duplicates
+
+    def _fingerprint_rows(self):
+        rows = self._conn.execute(
+            "SELECT url, fingerprint FROM articles WHERE duplicate_of IS NULL AND fingerprint IS NOT NULL")
+        return ((url, unpack(data)) for url, data in rows)
+
+    def fingerprints(self):
+        """重複でない記事の (URL, 指紋) の一覧（スクレイパーの重複判定の初期値に使う）"""
+        if not self._has_duplicates:
+            return []
+        with self._lock:
+            return list(self._fingerprint_rows())
+
+    def write(self, article, commit=True):
+        """記事を1件保存（同じURLがあれば置き換え）し、ほぼ同じ内容の既存記事があればそのURLを返す"""
+        values = [article.get(column) for column in ARTICLE_COLUMNS]
+        signature = fingerprint(article)
+        with self._lock:
+            original = self._duplicate_index().check(article, signature)
+            self._conn.execute(
+                f"INSERT INTO articles ({', '.join(ARTICLE_COLUMNS)}, sort_key, data, fingerprint, duplicate_of) "
+                f"VALUES ({', '.join('?' * len(ARTICLE_COLUMNS))}, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET "
+                + ', '.join(f"{column} = excluded.{column}" for column in ARTICLE_COLUMNS[1:])
+                + ", sort_key = excluded.sort_key, data = excluded.data"
+                + ", fingerprint = excluded.fingerprint, duplicate_of = excluded.duplicate_of",
+                values + [sort_key(article.get('scraped_at')), json.dumps(article, ensure_ascii=False),
+                          pack(signature) if signature else None, original])
+            article_id = self._conn.execute("SELECT id FROM articles WHERE url = ?", (article.get('url'),)).fetchone()[0]
+            if original:
+                # 重複は検索にも出さない
+                self.search_index.remove_article(article_id)
+            else:
+                self.search_index.index_article(article_id, article)
+            if commit:
+                self._conn.commit()
+        return original
+
+    def write_many(self, articles):
+        """複数の記事をまとめて保存し、件数を返す"""
+        count = 0
+        for article in articles:
+            self.write(article, commit=False)
+            count += 1
+        with self._lock:
+            self._conn.commit()
+        return count
+
+    def import_json(self, json_path):
+        """従来形式のJSON（記事の配列）を取り込み、件数を返す"""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                articles = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"読み込みエラー: {e}")
+            return 0
+        if not isinstance(articles, list):
+            return 0
+        return self.write_many(articles)
+
+    def _originals_only(self):
+        return " WHERE duplicate_of IS NULL" if self._has_duplicates else ""
+
+    def count(self):
+        """保存されている記事数"""
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM articles{self._originals_only()}").fetchone()[0]
+
+    def recent(self, limit=50, offset=0):
+        """新しい順に limit 件を取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM articles{self._originals_only()} ORDER BY sort_key DESC, id LIMIT ? OFFSET ?",
+                (limit, offset)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def search(self, query, limit=50, offset=0):
+        """検索語をすべて含む記事を新しい順に取得（(記事一覧, 総件数)）"""
+        with self._lock:
+            ids, total = self.search_index.search(query, limit, offset)
+            articles = []
+            for article_id in ids:
+                row = self._conn.execute("SELECT data FROM articles WHERE id = ?", (article_id,)).fetchone()
+                articles.append(json.loads(row[0]))
+        return articles, total
+
+    def close(self):
+        """ストアを閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -6,31 +6,40 @@
 
 import requests
 from bs4 import BeautifulSoup
-import pandas as pd
-from fake_useragent import UserAgent
-import time
 import json
+from rate_limiter import HostRateLimiter
+from http_cache import CachedSession
+from encoding_resolver import EncodingResolver
+from user_agents import UserAgentPool
 
 class BasicScraper:
-    def __init__(self):
-        self.ua = UserAgent()
-        self.session = requests.Session()
+    def __init__(self, rate_limiter=None, cache=None, user_agents=None):
+        # 同梱のUser-Agentからホストごとに選ぶ（起動時にデータの読み込みや通信をしない）
+        self.ua = user_agents or UserAgentPool()
+        # cacheにHTTPCacheを渡すと条件付きリクエストで再取得を省く
+        self.session = CachedSession(cache)
         self.session.headers.update({
-            'User-Agent': self.ua.random,
+            'User-Agent': self.ua.get(),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3',
             'Accept-Encoding': 'gzip, deflate',
             'Connection': 'keep-alive',
         })
+        # ホストごとのレート制限（他のホストへのリクエストは待たせない）
+        self.rate_limiter = rate_limiter or HostRateLimiter(session=self.session)
+        self.encoding_resolver = EncodingResolver()
     
-    def get_page(self, url, delay=1):
-        """指定されたURLからページを取得"""
+    def get_page(self, url, delay=None):
+        """指定されたURLからページを取得（delayを指定するとそのホストの間隔を上書き）"""
         try:
             print(f"取得中: {url}")
-            response = self.session.get(url, timeout=10)
+            if delay is not None:
+                self.rate_limiter.set_delay(url, delay)
+            if not self.session.is_fresh(url):
+                self.rate_limiter.acquire(url)
+            response = self.session.get(url, timeout=10, headers={'User-Agent': self.ua.get(url)})
             response.raise_for_status()
-            response.encoding = response.apparent_encoding
-            time.sleep(delay)  # サーバーに負荷をかけないよう待機
+            self.encoding_resolver.apply(response)
             return response.text
         except requests.RequestException as e:
             print(f"エラー: {e}")
@@ -85,6 +94,8 @@ class BasicScraper:
         try:
             # リンクデータをDataFrameに変換
             if data.get('links'):
+                # pandasは読み込みに時間がかかるので、CSVを保存するときだけ読み込む
+                import pandas as pd
                 df = pd.DataFrame(data['links'])
                 df.to_csv(filename, index=False, encoding='utf-8-sig')
                 print(f"データを {filename} に保存しました")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記事抽出のCPU時間を比較するベンチマーク（BeautifulSoup版 vs ArticleExtractor）
+
+使い方: python benchmarks/bench_extraction.py [繰り返し回数]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bs4 import BeautifulSoup
+
+from article_extractor import ArticleExtractor
+from news_scraper import NewsScraper
+
+
+def make_article_page(paragraphs=200, links=300):
+    """ニュース記事らしい合成HTMLを作成"""
+    nav = ''.join(f'<li><a href="/news/{i}">関連ニュースの見出し {i} がここに入ります</a></li>' for i in range(links))
+    body = ''.join(f'<p class="text">段落{i}：政府は本日、新しい経済対策を発表した。関係者によると、予算規模は拡大する見通しだ。</p>'
+                   for i in range(paragraphs))
+    return f"""<!doctype html>
+<html lang="ja"><head><meta charset="utf-8">
+<title>経済対策を発表 - サンプルニュース</title>
+<meta name="description" content="政府は新しい経済対策を発表した。">
+<script>window.__DATA__ = {{"published": "2019-01-01"}};</script>
+<style>.text {{ line-height: 1.6; }}</style>
+</head><body>
+<header><nav><ul>{nav}</ul></nav></header>
+<main><article><h1>経済対策を発表</h1><time>2024年5月3日 10:00</time>
+<div class="article-body">{body}</div></article></main>
+<footer><p>Copyright サンプルニュース</p></footer>
+</body></html>"""
+
+
+def extract_with_soup(scraper, html):
+    """NewsScraperの従来の抽出（BeautifulSoupで複数回走査）"""
+    soup = BeautifulSoup(html, 'lxml')
+    title = soup.find('title')
+    h1 = soup.find('h1')
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    return {
+        'title': title.get_text().strip() if title else "タイトルなし",
+        'h1': h1.get_text().strip() if h1 else "",
+        'description': meta_desc.get('content', '') if meta_desc else "",
+        'date': scraper._extract_date(soup),
+        'content': scraper._extract_content(soup),
+    }
+
+
+def measure(func, html, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = func(html)
+    return (time.process_time() - start) / repeat, result
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    html = make_article_page()
+    scraper = NewsScraper.__new__(NewsScraper)
+    extractor = ArticleExtractor()
+
+    soup_time, soup_result = measure(lambda h: extract_with_soup(scraper, h), html, repeat)
+    lxml_time, lxml_result = measure(extractor.extract, html, repeat)
+
+    print(f"ページサイズ: {len(html.encode('utf-8')) / 1024:.1f} KB, 繰り返し: {repeat} 回")
+    print(f"BeautifulSoup:    {soup_time * 1000:.2f} ms/記事")
+    print(f"ArticleExtractor: {lxml_time * 1000:.2f} ms/記事 ({soup_time / lxml_time:.1f}倍)")
+    if soup_result != lxml_result:
+        print("抽出結果が一致しません")
+        return 1
+    print("抽出結果は一致しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時間のベンチマーク（モジュールの読み込み＋スクレイパーの生成）
+
+新しいPythonプロセスで計測するため、cronや短命なワーカーの起動と同じ条件になる。
+読み込まれてはいけない重いモジュール（pandasなど）が読み込まれた場合や、
+中央値が上限を超えた場合は終了コード1で終わるので、CIで退行の検出に使える。
+
+使い方: python benchmarks/bench_startup.py [--repeat 5] [--max-ms 1000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 起動時に読み込まれてはいけないモジュール
+FORBIDDEN_MODULES = ['pandas', 'fake_useragent']
+
+# 計測対象（モジュール名, 生成するクラス名）
+TARGETS = [
+    ('news_scraper', 'NewsScraper'),
+    ('basic_scraper', 'BasicScraper'),
+]
+
+# 子プロセスで実行するコード（計測結果をJSONで出力する）
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+module = __import__({module!r})
+imported = time.perf_counter()
+getattr(module, {cls!r})()
+created = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'init_ms': (created - imported) * 1000,
+    'forbidden': [name for name in {forbidden!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(module, cls):
+    """新しいプロセスで1回計測する"""
+    code = _CHILD.format(module=module, cls=cls, forbidden=FORBIDDEN_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='起動時間のベンチマーク')
+    parser.add_argument('--repeat', type=int, default=5, help='計測回数（中央値を使う）')
+    parser.add_argument('--max-ms', type=float, default=1000,
+                        help='読み込み＋生成の中央値の上限（ミリ秒）。超えたら終了コード1')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, cls in TARGETS:
+        runs = [measure(module, cls) for _ in range(args.repeat)]
+        import_ms = statistics.median(run['import_ms'] for run in runs)
+        init_ms = statistics.median(run['init_ms'] for run in runs)
+        total_ms = statistics.median(run['import_ms'] + run['init_ms'] for run in runs)
+        forbidden = sorted({name for run in runs for name in run['forbidden']})
+
+        print(f"{module}.{cls}: 読み込み {import_ms:.1f} ms / 生成 {init_ms:.1f} ms / 合計 {total_ms:.1f} ms")
+        if forbidden:
+            print(f"  NG: 起動時に読み込まれています: {', '.join(forbidden)}")
+            failed = True
+        if total_ms > args.max_ms:
+            print(f"  NG: 上限 {args.max_ms:.0f} ms を超えています")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
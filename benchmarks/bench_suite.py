@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+実際のサイトにアクセスせずにスクレイパー全体の性能を測るベンチマーク
+
+ローカルの合成ニュースサイト（fixture_server.py、UTF-8とShift_JIS）に対して
+サイトのスクレイピング・記事の取得・抽出・保存・app.py の一覧ページを計測し、
+JSONのベースラインに保存・比較する。
+
+使い方:
+    python benchmarks/bench_suite.py --save              # 計測してベースラインを保存
+    python benchmarks/bench_suite.py                     # ベースラインと比較（遅くなっていれば終了コード1）
+    python benchmarks/bench_suite.py --latency 0.05 --links 100 --paragraphs 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+
+from fixture_server import FixtureServer, FixtureSite, article_text
+from article_extractor import ArticleExtractor
+from article_sink import JSONLSink, compact_jsonl
+from article_store import ArticleStore
+from news_scraper import NewsScraper
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# これより短い差は誤差として扱う（秒）
+NOISE_FLOOR = 0.002
+
+
+def quiet(func, *args, **kwargs):
+    """print の出力を捨てて実行"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def timed(func, repeat):
+    """funcを repeat 回実行し、1回あたりの秒数の中央値を返す"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def make_articles(count):
+    """保存・表示の計測用の記事データ（内容は記事ごとに異なる）"""
+    base = datetime(2024, 5, 3, 10, 0, 0)
+    return [{
+        'url': f'https://example.com/2024/05/03/article-{i}.html',
+        'title': f'記事{i}：経済対策を発表',
+        'h1': f'記事{i}：経済対策を発表',
+        'description': f'記事{i}の概要です。政府は新しい経済対策を発表した。',
+        'date': '2024年5月3日',
+        'content_preview': article_text(i, 0, 150) + '関係者によると、今後の国会審議で議論される見通しだ。',
+        'scraped_at': (base + timedelta(seconds=i)).isoformat(),
+    } for i in range(count)]
+
+
+def run_benchmarks(args):
+    """すべてのケースを計測し {ケース名: 秒} を返す"""
+    results = {}
+    sites = [
+        FixtureSite('utf8news', encoding='utf-8', links=args.links, paragraphs=args.paragraphs, latency=args.latency),
+        FixtureSite('sjisnews', encoding='shift_jis', links=args.links, paragraphs=args.paragraphs,
+                    latency=args.latency),
+    ]
+
+    with FixtureServer(sites) as server:
+        # サイト全体（トップページ → 記事の並列取得）。取得済みURLを持ち越さないよう毎回作り直す
+        for site in sites:
+            url = server.site_url(site.name)
+            fetched = quiet(NewsScraper(delay=0).scrape_news_site, url, args.max_articles)
+            if len(fetched) < min(args.max_articles, site.links):
+                print(f"警告: {site.name} から取得できた記事が {len(fetched)} 件しかありません")
+            results[f'scrape_news_site[{site.encoding}]'] = timed(
+                lambda: quiet(NewsScraper(delay=0).scrape_news_site, url, args.max_articles), args.repeat)
+
+        # 記事1件の取得と抽出
+        for site in sites:
+            scraper = NewsScraper(delay=0)
+            article_url = f'{server.base_url}/{site.name}/2024/05/03/article-0.html'
+            results[f'_get_article_info[{site.encoding}]'] = timed(
+                lambda: quiet(scraper._get_article_info, article_url), args.repeat)
+
+        # <head> だけを読む場合
+        scraper = NewsScraper(delay=0, head_only=True)
+        article_url = f'{server.base_url}/{sites[0].name}/2024/05/03/article-0.html'
+        results['_get_article_info[head_only]'] = timed(
+            lambda: quiet(scraper._get_article_info, article_url), args.repeat)
+
+    # 抽出処理（ネットワークなし）
+    scraper = NewsScraper(delay=0)
+    html = sites[0].article(0)
+    extractor = ArticleExtractor()
+    results['extract.article_extractor'] = timed(lambda: extractor.extract(html), args.repeat)
+
+    def extract_with_soup():
+        soup = BeautifulSoup(html, 'lxml')
+        scraper._extract_date(soup)
+        scraper._extract_content(soup)
+
+    results['extract.soup_helpers'] = timed(extract_with_soup, args.repeat)
+
+    # 保存処理と app.py の一覧ページ
+    articles = make_articles(args.articles)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'news_articles.json')
+        csv_path = os.path.join(tmp, 'news_articles.csv')
+        jsonl_path = os.path.join(tmp, 'news_articles.jsonl')
+        db_path = os.path.join(tmp, 'news_articles.sqlite3')
+
+        results['save_articles'] = timed(lambda: quiet(scraper.save_articles, articles, json_path), args.repeat)
+        results['save_to_csv'] = timed(lambda: quiet(scraper.save_to_csv, articles, csv_path), args.repeat)
+
+        with JSONLSink(jsonl_path, append=False, fsync_every=0) as sink:
+            for article in articles:
+                sink.write(article)
+        results['compact_jsonl'] = timed(lambda: compact_jsonl(jsonl_path, json_path, csv_path), args.repeat)
+
+        with ArticleStore(db_path) as store:
+            store.write_many(articles)
+        results.update(bench_app(db_path, json_path, args.repeat))
+
+    return results
+
+
+def bench_app(db_path, json_path, repeat):
+    """app.py の一覧ページ（キャッシュなし・キャッシュあり）を計測"""
+    import app as dashboard
+
+    dashboard.DB_PATH = db_path
+    dashboard.JSON_PATH = json_path
+    client = dashboard.app.test_client()
+
+    def uncached():
+        with dashboard._cache_lock:
+            dashboard._data_cache.clear()
+            dashboard._page_cache.clear()
+        assert client.get('/').status_code == 200
+
+    def cached():
+        assert client.get('/').status_code == 200
+
+    results = {'app.index': timed(uncached, repeat)}
+    client.get('/')
+    results['app.index_cached'] = timed(cached, repeat)
+    results['app.search'] = timed(lambda: (uncached(), client.get('/search?q=経済対策')), repeat)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ベースラインと比べて表示し、遅くなったケースの名前を返す"""
+    regressions = []
+    print(f"{'ケース':<32}{'今回':>12}{'基準':>12}{'比':>8}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32}{seconds * 1000:>10.2f}ms{'-':>12}{'-':>8}")
+            continue
+        ratio = seconds / base if base else float('inf')
+        mark = ''
+        if ratio > tolerance and seconds - base > NOISE_FLOOR:
+            regressions.append(name)
+            mark = '  NG'
+        print(f"{name:<32}{seconds * 1000:>10.2f}ms{base * 1000:>10.2f}ms{ratio:>7.2f}x{mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='合成ニュースサイトに対するスクレイパーのベンチマーク')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='ベースラインのJSONファイル')
+    parser.add_argument('--save', action='store_true', help='計測結果をベースラインとして保存')
+    parser.add_argument('--tolerance', type=float, default=1.3, help='この倍率を超えて遅くなったら退行とみなす')
+    parser.add_argument('--repeat', type=int, default=5, help='各ケースの実行回数（中央値を使う）')
+    parser.add_argument('--latency', type=float, default=0.0, help='合成サイトの応答遅延（秒）')
+    parser.add_argument('--links', type=int, default=50, help='トップページの記事リンク数')
+    parser.add_argument('--paragraphs', type=int, default=50, help='記事ページの段落数')
+    parser.add_argument('--max-articles', type=int, default=20, help='1サイトから取得する記事数')
+    parser.add_argument('--articles', type=int, default=2000, help='保存・表示の計測に使う記事数')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+
+    if args.save:
+        data = {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {key: getattr(args, key) for key in ('latency', 'links', 'paragraphs', 'max_articles', 'articles')},
+            'results': results,
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        for name, seconds in results.items():
+            print(f"{name:<32}{seconds * 1000:>10.2f}ms")
+        print(f"ベースラインを {args.baseline} に保存しました")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        for name, seconds in results.items():
+            print(f"{name:<32}{seconds * 1000:>10.2f}ms")
+        print(f"ベースライン {args.baseline} がありません（--save で作成できます）")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"遅くなったケース: {', '.join(regressions)}")
+        return 1
+    print("退行はありません")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
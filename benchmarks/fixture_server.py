@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク用のローカルなニュースサイト（トップページと記事ページを合成して返すHTTPサーバー）
+
+URLの形式:
+    /{サイト名}/                          トップページ（記事へのリンクとナビゲーションのリンク）
+    /{サイト名}/2024/05/03/article-{i}.html  記事ページ
+    /robots.txt                           すべて許可（Crawl-delayなし）
+
+サイトごとの文字コードは FixtureSite で指定する（'utf-8' または 'shift_jis'）。
+Shift_JISのサイトはContent-Typeにcharsetを付けず、<meta charset> から判定させる。
+"""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 記事ごとに異なる本文を作るための文字（Shift_JISでも表せるもの）
+_TEXT_CHARS = 'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわを政府経済国会予算選挙地域市場企業'
+
+
+def article_text(number, paragraph, length=60):
+    """記事番号と段落から決まる文章（記事ごとに内容が異なり、サイトが違っても同じ番号なら同じ）"""
+    rng = random.Random(number * 100003 + paragraph)
+    return ''.join(rng.choice(_TEXT_CHARS) for _ in range(length))
+
+
+class FixtureSite:
+    """合成サイトの設定
+
+    encoding   : 'utf-8' または 'shift_jis'
+    links      : トップページにある記事へのリンク数
+    nav_links  : 記事以外のリンク数
+    paragraphs : 記事ページの段落数（ページの大きさ）
+    latency    : 応答までの遅延（秒）
+    """
+
+    def __init__(self, name, encoding='utf-8', links=50, nav_links=100, paragraphs=50, latency=0.0):
+        self.name = name
+        self.encoding = encoding
+        self.links = links
+        self.nav_links = nav_links
+        self.paragraphs = paragraphs
+        self.latency = latency
+
+    def homepage(self):
+        nav = ''.join(f'<li><a href="/{self.name}/category/{i}/">カテゴリ{i}</a></li>' for i in range(self.nav_links))
+        articles = ''.join(
+            f'<li><a href="/{self.name}/2024/05/03/article-{i}.html?utm_source=top">'
+            f'記事{i}：政府が新しい経済対策を発表、予算規模は拡大の見通し</a></li>'
+            for i in range(self.links))
+        return self._page(f'{self.name} トップ', f'<nav><ul>{nav}</ul></nav><main><ul>{articles}</ul></main>')
+
+    def article(self, number):
+        # 同じ番号の記事はどのサイトでも同じ本文になる（配信記事の転載と同じ状況）
+        body = ''.join(f'<p>段落{i}：{article_text(number, i)}。関係者によると、今後の国会審議で議論される見通しだ。</p>'
+                       for i in range(self.paragraphs))
+        title = f'記事{number}：経済対策を発表'
+        return self._page(
+            f'{title} - {self.name}',
+            f'<article><h1>{title}</h1><time>2024年5月3日 10:00</time>'
+            f'<div class="article-body">{body}</div></article>',
+            description=f'記事{number}の概要です。政府は新しい経済対策を発表した。',
+            head='<meta property="article:published_time" content="2024-05-03T10:00:00+09:00">')
+
+    def _page(self, title, body, description='', head=''):
+        charset = 'Shift_JIS' if self.encoding == 'shift_jis' else 'utf-8'
+        return (f'<!doctype html><html lang="ja"><head><meta charset="{charset}"><title>{title}</title>'
+                f'<meta name="description" content="{description}">{head}'
+                f'<script>window.dataLayer = [];</script></head>'
+                f'<body><header><p>{self.name}</p></header>{body}<footer><p>Copyright</p></footer></body></html>')
+
+    def content_type(self):
+        # Shift_JISはヘッダーに書かず、<meta charset> の判定を通す
+        return 'text/html; charset=utf-8' if self.encoding == 'utf-8' else 'text/html'
+
+
+class FixtureServer:
+    """合成サイトを 127.0.0.1 の空いているポートで配信する（with文で起動・停止）"""
+
+    def __init__(self, sites):
+        self.sites = {site.name: site for site in sites}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def site_url(self, name):
+        return f'{self.base_url}/{name}/'
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                body, content_type, latency = server.render(self.path.split('?', 1)[0])
+                if latency:
+                    time.sleep(latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def render(self, path):
+        """パスに対応する (本文のバイト列, Content-Type, 遅延) を返す（なければ本文はNone）"""
+        if path == '/robots.txt':
+            return b'User-agent: *\nAllow: /\n', 'text/plain', 0
+        parts = [part for part in path.split('/') if part]
+        site = self.sites.get(parts[0]) if parts else None
+        if site is None:
+            return None, None, 0
+        if len(parts) == 1:
+            html = site.homepage()
+        elif parts[-1].startswith('article-') and parts[-1].endswith('.html'):
+            try:
+                html = site.article(int(parts[-1][len('article-'):-len('.html')]))
+            except ValueError:
+                return None, None, site.latency
+        else:
+            return None, None, site.latency
+        return html.encode(site.encoding), site.content_type(), site.latency
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WebDriverのプール（ヘッドレスChromeを事前に起動して使い回す）
+
+ブラウザの起動は重いので、N個のドライバーをあらかじめ起動しておき、
+ワーカーに貸し出して並列にページを処理する。一定のページ数を処理したドライバーや
+メモリが増えすぎたドライバーは終了し、次に貸し出すときに起動し直す。
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # psutilがなければブラウザのJSヒープで代用する
+    psutil = None
+
+
+def default_pool_size():
+    """既定のドライバー数（CPUコア数、ただしメモリを考えて最大4）"""
+    return max(1, min(os.cpu_count() or 1, 4))
+
+
+def driver_memory_mb(driver):
+    """ドライバーが使っているメモリ（MB）。測れなければNone
+
+    psutilがあればchromedriverとその子プロセス（Chrome本体）のRSSの合計、
+    なければページのJSヒープ使用量（performance.memory）を使う。
+    """
+    if psutil is not None:
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            total = 0
+            for p in processes:
+                try:
+                    total += p.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total / (1024 * 1024)
+        except (AttributeError, psutil.Error):
+            pass
+    try:
+        used = driver.execute_script(
+            "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null")
+    except Exception:
+        return None
+    return used / (1024 * 1024) if used else None
+
+
+class _Slot:
+    """プール内の1台分（ドライバーと処理したページ数）"""
+
+    def __init__(self):
+        self.driver = None
+        self.pages = 0
+
+
+class DriverPool:
+    """WebDriverを事前起動して貸し出し、使い込んだものは作り直すプール
+
+    factory    : 新しいドライバーを返す関数（失敗したら例外を送出する）
+    size       : ドライバーの数（同時に処理できるページ数）
+    max_pages  : この数のページを処理したドライバーは作り直す（Noneなら無制限）
+    max_memory_mb : メモリがこれを超えたドライバーは作り直す（Noneなら確認しない）
+    """
+
+    def __init__(self, factory, size=None, max_pages=50, max_memory_mb=1024, prewarm=True):
+        self.factory = factory
+        self.size = size or default_pool_size()
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.recycled = 0
+        self._lock = threading.Lock()
+        self._slots = [_Slot() for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for slot in self._slots:
+            self._idle.put(slot)
+        self._closed = False
+        if prewarm:
+            self.prewarm()
+
+    def prewarm(self):
+        """すべてのドライバーを並列に起動しておく（起動できた数を返す）"""
+        empty = [slot for slot in self._slots if slot.driver is None]
+        if not empty:
+            return 0
+
+        def start(slot):
+            try:
+                slot.driver = self.factory()
+                return True
+            except Exception as e:
+                print(f"ドライバーの起動に失敗: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(empty)) as executor:
+            started = sum(executor.map(start, empty))
+        print(f"ドライバーを {started}/{len(empty)} 台起動しました")
+        return started
+
+    @contextmanager
+    def driver(self):
+        """ドライバーを1台借りる（with文を抜けると返却される）"""
+        if self._closed:
+            raise RuntimeError("ドライバープールは閉じられています")
+        slot = self._idle.get()
+        broken = False
+        try:
+            if slot.driver is None:
+                slot.driver = self.factory()
+                slot.pages = 0
+            yield slot.driver
+        except Exception:
+            # 処理中に例外が出たドライバーは状態が分からないので作り直す
+            broken = True
+            raise
+        finally:
+            slot.pages += 1
+            if slot.driver is not None and (broken or self._should_recycle(slot)):
+                self._quit(slot)
+                with self._lock:
+                    self.recycled += 1
+            self._idle.put(slot)
+
+    def _should_recycle(self, slot):
+        if self.max_pages and slot.pages >= self.max_pages:
+            return True
+        if self.max_memory_mb:
+            memory = driver_memory_mb(slot.driver)
+            if memory is not None and memory > self.max_memory_mb:
+                print(f"ドライバーのメモリが {memory:.0f} MB に達したため作り直します")
+                return True
+        return False
+
+    def _quit(self, slot):
+        driver, slot.driver, slot.pages = slot.driver, None, 0
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"ドライバーの終了に失敗: {e}")
+
+    def map(self, func, items):
+        """func(driver, item) を各ドライバーで並列に実行し、itemsの順に結果を返す（失敗はNone）"""
+        def run(item):
+            try:
+                with self.driver() as driver:
+                    return func(driver, item)
+            except Exception as e:
+                print(f"並列処理に失敗: {item}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run, items))
+
+    def close(self):
+        """すべてのドライバーを終了する"""
+        self._closed = True
+        for slot in self._slots:
+            if slot.driver is not None:
+                self._quit(slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+レスポンスの文字コードを高速に判定する
+
+response.apparent_encoding は本文全体を統計的に解析するため、大きなページでは遅い。
+ここでは HTTPヘッダー → BOM → 先頭付近の <meta charset> → ホストごとのキャッシュ
+の順に調べ、どれもなければ先頭の一部だけで統計的に判定する。
+"""
+
+import codecs
+import re
+import threading
+from urllib.parse import urlparse
+
+try:
+    import charset_normalizer
+except ImportError:  # requestsの古い環境ではchardetのみ
+    charset_normalizer = None
+    import chardet
+
+_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 日本語サイトで使われる別名を、実際に使われている拡張を含む文字コードに寄せる
+_ALIASES = {
+    'shift_jis': 'cp932',
+    'shift-jis': 'cp932',
+    'sjis': 'cp932',
+    'x-sjis': 'cp932',
+    'ms_kanji': 'cp932',
+    'windows-31j': 'cp932',
+    'cp932': 'cp932',
+    'euc-jp': 'euc_jp',
+    'x-euc-jp': 'euc_jp',
+}
+
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_NON_ASCII = re.compile(rb'[\x80-\xff]')
+
+
+def normalize_encoding(name):
+    """文字コード名を正規化（Pythonで扱えない名前ならNone）"""
+    if not name:
+        return None
+    name = name.strip().lower()
+    name = _ALIASES.get(name, name)
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    # <meta>でUTF-16と宣言されていても、ASCII互換で読めている以上はUTF-8として扱う
+    if name.replace('_', '-').startswith('utf-16'):
+        return 'utf-8'
+    return name
+
+
+class EncodingResolver:
+    """レスポンスの文字コードを判定し、ホストごとに結果を覚えておく"""
+
+    def __init__(self, sniff_bytes=4096, detect_bytes=32 * 1024):
+        self.sniff_bytes = sniff_bytes
+        self.detect_bytes = detect_bytes
+        self._host_encodings = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, content, content_type=None, url=None):
+        """本文（バイト列）とContent-Typeから文字コードを判定"""
+        host = urlparse(url).netloc.lower() if url else None
+
+        if content_type:
+            match = _HEADER_CHARSET.search(content_type)
+            encoding = normalize_encoding(match.group(1)) if match else None
+            if encoding:
+                return self._remember(host, encoding)
+
+        for bom, encoding in _BOMS:
+            if content.startswith(bom):
+                return self._remember(host, encoding)
+
+        match = _META_CHARSET.search(content[:self.sniff_bytes])
+        encoding = normalize_encoding(match.group(1).decode('ascii', 'ignore')) if match else None
+        if encoding:
+            return self._remember(host, encoding)
+
+        with self._lock:
+            cached = self._host_encodings.get(host)
+        if cached:
+            return cached
+
+        return self._remember(host, self._detect(content))
+
+    def apply(self, response):
+        """requestsのレスポンスに判定した文字コードを設定"""
+        encoding = self.resolve(response.content, response.headers.get('Content-Type'), response.url)
+        response.encoding = encoding
+        return encoding
+
+    def _remember(self, host, encoding):
+        if host:
+            with self._lock:
+                self._host_encodings[host] = encoding
+        return encoding
+
+    def _detect(self, content):
+        """先頭付近（ASCIIだけの部分は飛ばす）の一部だけで文字コードを推定"""
+        match = _NON_ASCII.search(content)
+        if not match:
+            return 'utf-8'
+        start = max(0, match.start() - 64)
+        sample = content[start:start + self.detect_bytes]
+        if len(sample) == self.detect_bytes:
+            # タグの切れ目で区切り、途中で切れた文字を判定に含めない
+            cut = sample.rfind(b'>')
+            if cut > len(sample) // 2:
+                sample = sample[:cut + 1]
+
+        # 途中で切れた多バイト文字は無視して、UTF-8として読めるならUTF-8
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        if charset_normalizer is not None:
+            best = charset_normalizer.from_bytes(sample).best()
+            detected = best.encoding if best else None
+        else:
+            detected = chardet.detect(sample).get('encoding')
+        return normalize_encoding(detected) or 'utf-8'
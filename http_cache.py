@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ETag / Last-Modified による条件付きリクエスト対応のディスクキャッシュ
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 本文は展開済みで保存するため、転送関連のヘッダーは保存しない
+_DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class HTTPCache:
+    """URLごとに本文と検証用ヘッダーを保存するLRUキャッシュ
+
+    本文は cache_dir/bodies に、メタデータは SQLite に保存する。
+    合計サイズが max_bytes を超えると最終アクセスの古いものから削除する。
+    TTL内のエントリはリクエストせずに返し、それ以外は条件付きリクエストで再検証する。
+    """
+
+    def __init__(self, cache_dir='.http_cache', max_bytes=200 * 1024 * 1024,
+                 default_ttl=0, host_ttls=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.host_ttls = dict(host_ttls or {})
+        self._body_dir = os.path.join(cache_dir, 'bodies')
+        os.makedirs(self._body_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                final_url TEXT,
+                status INTEGER,
+                headers TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER,
+                stored_at REAL,
+                last_access REAL,
+                parsed TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        self._conn.commit()
+
+    def _body_path(self, url):
+        return os.path.join(self._body_dir, hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+    def ttl_for(self, url):
+        """ホストごとのTTL（秒）を返す"""
+        host = urlparse(url).netloc.lower()
+        return self.host_ttls.get(host, self.default_ttl)
+
+    def set_ttl(self, host, ttl):
+        """ホストのTTL（秒）を設定"""
+        self.host_ttls[host.lower()] = ttl
+
+    def lookup(self, url):
+        """キャッシュエントリを取得（本文がなければNone）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT final_url, status, headers, etag, last_modified, stored_at FROM entries WHERE url = ?",
+                (url,)).fetchone()
+            if not row:
+                return None
+            try:
+                with open(self._body_path(url), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        final_url, status, headers, etag, last_modified, stored_at = row
+        return {
+            'url': final_url,
+            'status': status,
+            'headers': json.loads(headers),
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': stored_at,
+            'body': body,
+        }
+
+    def is_fresh(self, url, entry=None):
+        """TTL内でリクエスト不要かどうか"""
+        ttl = self.ttl_for(url)
+        if ttl <= 0:
+            return False
+        if entry is None:
+            with self._lock:
+                row = self._conn.execute("SELECT stored_at FROM entries WHERE url = ?", (url,)).fetchone()
+            stored_at = row[0] if row else None
+        else:
+            stored_at = entry['stored_at']
+        return stored_at is not None and time.time() - stored_at < ttl
+
+    def store(self, url, response):
+        """200レスポンスを保存（検証用ヘッダーもTTLもない場合は保存しない）"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified or self.ttl_for(url) > 0):
+            return
+        body = response.content
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS}
+        path = self._body_path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                (url, response.url, response.status_code, json.dumps(headers), etag, last_modified,
+                 len(body), now, now))
+            self._conn.commit()
+            self._evict()
+
+    def revalidated(self, url, response):
+        """304を受け取ったエントリの検証用ヘッダーと保存時刻を更新"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE entries SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+                "stored_at = ? WHERE url = ?",
+                (response.headers.get('ETag'), response.headers.get('Last-Modified'), time.time(), url))
+            self._conn.commit()
+
+    def get_parsed(self, url):
+        """本文から抽出済みのデータを取得（本文が変わると消える）"""
+        with self._lock:
+            row = self._conn.execute("SELECT parsed FROM entries WHERE url = ?", (url,)).fetchone()
+        if row and row[0]:
+            return json.loads(row[0])
+        return None
+
+    def set_parsed(self, url, data):
+        """本文から抽出したデータを保存"""
+        with self._lock:
+            self._conn.execute("UPDATE entries SET parsed = ? WHERE url = ?",
+                               (json.dumps(data, ensure_ascii=False), url))
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT url, size FROM entries ORDER BY last_access").fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+            total -= size
+        self._conn.commit()
+
+    def close(self):
+        """キャッシュを閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedSession(requests.Session):
+    """HTTPCache を使って GET を条件付きリクエストにする Session
+
+    キャッシュから返したレスポンスは from_cache が True になる。
+    304 の場合は本文をダウンロードせず、保存済みの本文を返す。
+    stream=True の200レスポンスは本文を最後まで読んだか分からないので保存しない（読んだ側で store する）。
+    """
+
+    def __init__(self, cache=None):
+        super().__init__()
+        self.cache = cache
+
+    def is_fresh(self, url):
+        """リクエストせずにキャッシュから返せるかどうか"""
+        return self.cache is not None and self.cache.is_fresh(url)
+
+    def request(self, method, url, **kwargs):
+        if self.cache is None or method.upper() != 'GET':
+            return super().request(method, url, **kwargs)
+
+        entry = self.cache.lookup(url)
+        if entry and self.cache.is_fresh(url, entry):
+            return self._from_entry(entry)
+
+        if entry:
+            headers = dict(kwargs.get('headers') or {})
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            kwargs['headers'] = headers
+
+        response = super().request(method, url, **kwargs)
+        if response.status_code == 304 and entry:
+            self.cache.revalidated(url, response)
+            # stream=True のレスポンスも閉じて、接続をプールに戻す
+            response.close()
+            return self._from_entry(entry, response)
+        if response.status_code == 200 and not kwargs.get('stream'):
+            self.cache.store(url, response)
+        response.from_cache = False
+        return response
+
+    @staticmethod
+    def _from_entry(entry, revalidation=None):
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response._content_consumed = True
+        response.url = entry['url']
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        if revalidation is not None:
+            response.request = revalidation.request
+            response.elapsed = revalidation.elapsed
+        response.from_cache = True
+        return response
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静的取得を優先し、JavaScriptで描画されるページだけブラウザで取得するフェッチャー
+
+まず requests（BasicScraper）で取得し、本文がほとんど空・<noscript> の案内・SPAのルート要素など
+JavaScriptで描画されるページの特徴があればSeleniumで取得し直す。
+ブラウザが必要だったホストは記録しておき、次からは最初からブラウザで取得する。
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+from lxml import etree
+
+from article_extractor import strip_xml_declaration
+from basic_scraper import BasicScraper
+
+# 本文の文字数がこれ未満ならJavaScriptで描画されるページとみなす
+MIN_TEXT_LENGTH = 200
+
+# SPAのルート要素（中身が空ならJavaScriptで描画される）
+SPA_ROOT_IDS = ['root', 'app', '__next', '__nuxt', 'svelte', 'main-app']
+SPA_MARKERS = ['window.__NUXT__', 'window.__INITIAL_STATE__', 'ng-version', 'data-reactroot', 'data-server-rendered']
+
+_NOSCRIPT_HINT = re.compile(r'javascript|有効に|enable', re.IGNORECASE)
+_TEXT_EXCLUDED_TAGS = {'script', 'style', 'noscript', 'template'}
+_SPACES = re.compile(r'\s+')
+
+
+def _visible_text_length(body):
+    """script・style などを除いたbodyのテキストの文字数（空白は数えない）"""
+    length = 0
+    stack = [body]
+    while stack:
+        element = stack.pop()
+        if not isinstance(element.tag, str) or element.tag.lower() in _TEXT_EXCLUDED_TAGS:
+            if element.tail and element is not body:
+                length += len(_SPACES.sub('', element.tail))
+            continue
+        if element.text:
+            length += len(_SPACES.sub('', element.text))
+        if element.tail and element is not body:
+            length += len(_SPACES.sub('', element.tail))
+        stack.extend(element)
+    return length
+
+
+def detect_js_rendering(html, min_text_length=MIN_TEXT_LENGTH):
+    """JavaScriptで描画されるページらしければ理由の文字列、そうでなければNoneを返す"""
+    if not html or not html.strip():
+        return "本文が空"
+    try:
+        root = etree.fromstring(strip_xml_declaration(html), etree.HTMLParser(recover=True))
+    except (etree.XMLSyntaxError, ValueError):
+        return None
+    if root is None:
+        return "本文が空"
+    body = root.find('.//body')
+    text_length = _visible_text_length(body) if body is not None else 0
+    if text_length >= min_text_length:
+        return None
+
+    # 本文が短い場合に、JavaScriptで描画されることを示す手がかりを探す
+    for element in root.iter('noscript'):
+        if _NOSCRIPT_HINT.search(etree.tostring(element, method='text', encoding='unicode') or ''):
+            return "<noscript> にJavaScriptを有効にする案内"
+    for root_id in SPA_ROOT_IDS:
+        for element in root.xpath('//*[@id=$id]', id=root_id):
+            if _visible_text_length(element) < min_text_length:
+                return f"SPAのルート要素 #{root_id}"
+    for marker in SPA_MARKERS:
+        if marker in html:
+            return f"SPAの目印 {marker}"
+    if text_length == 0:
+        return "本文のテキストがない"
+    return None
+
+
+class HybridFetcher:
+    """静的取得を優先し、必要なときだけブラウザに切り替えるフェッチャー
+
+    static       : 静的取得に使うスクレイパー（get_page(url) がHTMLを返すもの。既定はBasicScraper）
+    browser_factory : ブラウザのスクレイパーを作る関数（初めて必要になったときに呼ぶ。既定はSeleniumScraper）
+    state_path   : ホストごとの判定を保存するJSONファイル（Noneなら保存しない）
+    """
+
+    def __init__(self, static=None, browser_factory=None, min_text_length=MIN_TEXT_LENGTH, state_path=None):
+        self.static = static or BasicScraper()
+        self.browser_factory = browser_factory or self._default_browser
+        self.min_text_length = min_text_length
+        self.state_path = state_path
+        self.browser = None
+        self.stats = {'static': 0, 'browser': 0, 'escalated': 0}
+        self._lock = threading.Lock()
+        # ホスト → 'static' または 'browser'
+        self.host_modes = self._load_state()
+
+    @staticmethod
+    def _default_browser():
+        # Seleniumは読み込みが重いので、ブラウザが必要になるまで読み込まない
+        from selenium_scraper import SeleniumScraper
+        return SeleniumScraper(headless=True)
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"読み込みエラー: {e}")
+            return {}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.host_modes, f, ensure_ascii=False, indent=2)
+            os.replace(self.state_path + '.tmp', self.state_path)
+        except OSError as e:
+            print(f"保存エラー: {e}")
+
+    def mode_for(self, url):
+        """ホストについて記録済みの取得方法（未知ならNone）"""
+        return self.host_modes.get(urlparse(url).netloc.lower())
+
+    def _remember(self, url, mode):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if self.host_modes.get(host) == mode:
+                return
+            self.host_modes[host] = mode
+            self._save_state()
+
+    def _get_browser(self):
+        with self._lock:
+            if self.browser is None:
+                self.browser = self.browser_factory()
+            return self.browser
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def fetch(self, url):
+        """ページを取得し {'url', 'html', 'method', 'reason'} を返す（失敗したらhtmlはNone）"""
+        if self.mode_for(url) == 'browser':
+            self._count('browser')
+            return {'url': url, 'html': self._get_browser().get_page(url), 'method': 'browser',
+                    'reason': "ホストの記録"}
+
+        html = self.static.get_page(url)
+        if html is None:
+            return {'url': url, 'html': None, 'method': 'static', 'reason': "取得失敗"}
+
+        reason = detect_js_rendering(html, self.min_text_length)
+        if reason is None:
+            self._count('static')
+            self._remember(url, 'static')
+            return {'url': url, 'html': html, 'method': 'static', 'reason': None}
+
+        print(f"JavaScriptで描画されるページと判定（{reason}）: {url}")
+        browser_html = self._get_browser().get_page(url)
+        if browser_html is None:
+            # ブラウザでも取得できなければ静的取得の結果を返す
+            self._count('static')
+            return {'url': url, 'html': html, 'method': 'static', 'reason': reason}
+        self._count('escalated')
+        self._count('browser')
+        self._remember(url, 'browser')
+        return {'url': url, 'html': browser_html, 'method': 'browser', 'reason': reason}
+
+    def close(self):
+        """ブラウザを起動していれば閉じ、判定を保存する"""
+        if self.browser is not None:
+            self.browser.close()
+            self.browser = None
+        self._save_state()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description='静的取得を優先し、必要なページだけブラウザで取得')
+    parser.add_argument('urls', nargs='+', help='取得するURL')
+    parser.add_argument('--state', default='hybrid_hosts.json', help='ホストごとの判定を保存するファイル')
+    args = parser.parse_args(argv)
+
+    with HybridFetcher(state_path=args.state) as fetcher:
+        for url in args.urls:
+            result = fetcher.fetch(url)
+            size = len(result['html']) if result['html'] else 0
+            print(f"{result['method']}: {url} ({size} 文字)")
+        print(f"静的: {fetcher.stats['static']} 件 / ブラウザ: {fetcher.stats['browser']} 件"
+              f"（うち切り替え {fetcher.stats['escalated']} 件）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スクレイピングの処理段階ごとの計測（時間・件数・バイト数）と、必要なときだけのプロファイル
+
+処理段階（待機・通信・文字コード判定・パース・抽出など）とホストごとに時間を集計し、
+実行の最後にJSONとPrometheusのテキスト形式で書き出す。無効にした場合はほぼ何もしない。
+"""
+
+import cProfile
+import heapq
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class _NullTimer:
+    """計測が無効なときのタイマー（何もしない）"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics, phase, url):
+        self.metrics = metrics
+        self.phase = phase
+        self.url = url
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.metrics.observe(self.phase, time.perf_counter() - self.start, self.url, error=exc_type is not None)
+        return False
+
+
+def _host(url):
+    return urlparse(url).netloc.lower() if url else ''
+
+
+class Metrics:
+    """処理段階・ホストごとの時間と、件数・バイト数のカウンター
+
+    with metrics.timer('download', url): ...   処理段階の時間を計る
+    metrics.observe('wait', seconds, url)       計った時間を記録する
+    metrics.count('errors', url=url)            件数を数える
+    slowest : URLごとの所要時間のうち、遅いものをこの件数だけ残す
+    """
+
+    def __init__(self, enabled=True, slowest=20):
+        self.enabled = enabled
+        self.slowest = slowest
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        # (処理段階, ホスト) → [回数, 合計秒, 最大秒]
+        self._timings = {}
+        # (名前, ホスト) → 値
+        self._counters = {}
+        # (秒, 処理段階, URL) の小さい順のヒープ（遅いURLだけを残す）
+        self._slow_urls = []
+
+    def timer(self, phase, url=None):
+        """処理段階の時間を計るコンテキストマネージャー"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, phase, url)
+
+    def observe(self, phase, seconds, url=None, error=False):
+        """処理段階の時間を記録する（例外で終わった場合は errors も数える）"""
+        if not self.enabled:
+            return
+        key = (phase, _host(url))
+        with self._lock:
+            stat = self._timings.get(key)
+            if stat is None:
+                self._timings[key] = [1, seconds, seconds]
+            else:
+                stat[0] += 1
+                stat[1] += seconds
+                stat[2] = max(stat[2], seconds)
+            if url and self.slowest:
+                item = (seconds, phase, url)
+                if len(self._slow_urls) < self.slowest:
+                    heapq.heappush(self._slow_urls, item)
+                elif item > self._slow_urls[0]:
+                    heapq.heapreplace(self._slow_urls, item)
+        if error:
+            self.count('errors', url=url)
+
+    def count(self, name, value=1, url=None):
+        """カウンターを増やす（urlを渡すとホストごとに数える）"""
+        if not self.enabled:
+            return
+        key = (name, _host(url))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_response(self, url, response, stream=False):
+        """レスポンスの件数・状態・バイト数・キャッシュの利用を記録する
+
+        stream=True なら本文をまだ読んでいないので、バイト数は読んだ側が bytes_downloaded に数える。
+        """
+        if not self.enabled or response is None:
+            return
+        self.count('requests', url=url)
+        self.count(f'status_{response.status_code}', url=url)
+        if getattr(response, 'from_cache', False):
+            self.count('cache_hits', url=url)
+        elif not stream:
+            self.count('bytes_downloaded', len(response.content or b''), url=url)
+        # ヘッダーを受け取るまでの時間（名前解決・接続・サーバーの処理を含む）
+        if response.elapsed:
+            self.observe('time_to_headers', response.elapsed.total_seconds(), url)
+
+    def summary(self):
+        """集計結果を辞書で返す"""
+        with self._lock:
+            phases = {}
+            for (phase, host), (count, total, maximum) in sorted(self._timings.items()):
+                entry = phases.setdefault(phase, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'hosts': {}})
+                entry['count'] += count
+                entry['seconds'] += total
+                entry['max_seconds'] = max(entry['max_seconds'], maximum)
+                if host:
+                    entry['hosts'][host] = {'count': count, 'seconds': round(total, 6), 'max_seconds': round(maximum, 6)}
+            counters = {}
+            for (name, host), value in sorted(self._counters.items()):
+                entry = counters.setdefault(name, {'total': 0, 'hosts': {}})
+                entry['total'] += value
+                if host:
+                    entry['hosts'][host] = value
+            slow_urls = [{'url': url, 'phase': phase, 'seconds': round(seconds, 6)}
+                         for seconds, phase, url in sorted(self._slow_urls, reverse=True)]
+        for entry in phases.values():
+            entry['seconds'] = round(entry['seconds'], 6)
+            entry['max_seconds'] = round(entry['max_seconds'], 6)
+        return {
+            'started_at': self.started_at,
+            'elapsed_seconds': round(time.time() - self.started_at, 6),
+            'phases': phases,
+            'counters': counters,
+            'slowest_urls': slow_urls,
+        }
+
+    def to_json(self):
+        return json.dumps(self.summary(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix='news_scraper'):
+        """Prometheusのテキスト形式（node_exporterのtextfileコレクターで読める）"""
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+        lines = [
+            f'# HELP {prefix}_phase_seconds_total 処理段階ごとの合計時間',
+            f'# TYPE {prefix}_phase_seconds_total counter',
+        ]
+        lines += [f'{prefix}_phase_seconds_total{{phase="{phase}",host="{host}"}} {total:.6f}'
+                  for (phase, host), (_, total, _) in timings]
+        lines += [
+            f'# HELP {prefix}_phase_count_total 処理段階ごとの回数',
+            f'# TYPE {prefix}_phase_count_total counter',
+        ]
+        lines += [f'{prefix}_phase_count_total{{phase="{phase}",host="{host}"}} {count}'
+                  for (phase, host), (count, _, _) in timings]
+        lines += [
+            f'# HELP {prefix}_events_total 件数・バイト数のカウンター',
+            f'# TYPE {prefix}_events_total counter',
+        ]
+        lines += [f'{prefix}_events_total{{name="{name}",host="{host}"}} {value}'
+                  for (name, host), value in counters]
+        lines.append(f'{prefix}_run_seconds {time.time() - self.started_at:.6f}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, json_path=None, prometheus_path=None):
+        """集計結果をファイルに書き出す"""
+        if not self.enabled:
+            return
+        for path, text in ((json_path, self.to_json), (prometheus_path, self.to_prometheus)):
+            if not path:
+                continue
+            try:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(text())
+                print(f"計測結果を {path} に保存しました")
+            except OSError as e:
+                print(f"保存エラー: {e}")
+
+    def report(self, top=8):
+        """時間のかかった処理段階を表示"""
+        if not self.enabled:
+            return
+        phases = self.summary()['phases']
+        print("\n処理段階ごとの時間（合計秒 / 回数）:")
+        for phase, entry in sorted(phases.items(), key=lambda item: item[1]['seconds'], reverse=True)[:top]:
+            print(f"  {phase:<16} {entry['seconds']:>9.3f} 秒 / {entry['count']} 回")
+
+
+class SamplingProfiler:
+    """全スレッドのスタックを一定間隔で記録する簡易サンプリングプロファイラー
+
+    cProfileは有効にしたスレッドしか計測しないため、記事を並列に取得するワーカースレッドの
+    ホットスポットはこちらで調べる。計測中も対象のスレッドにはほとんど負荷をかけない。
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = {}
+        self.total_counts = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                self.samples += 1
+                seen = set()
+                top = True
+                while frame is not None:
+                    code = frame.f_code
+                    key = f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+                    if top:
+                        self.self_counts[key] = self.self_counts.get(key, 0) + 1
+                        top = False
+                    if key not in seen:
+                        seen.add(key)
+                        self.total_counts[key] = self.total_counts.get(key, 0) + 1
+                    frame = frame.f_back
+
+    def stats(self, top=30):
+        """(関数, 自身のサンプル数, 呼び出し先を含むサンプル数) の多い順"""
+        items = sorted(self.self_counts.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [{'function': key, 'self': count, 'total': self.total_counts.get(key, 0)} for key, count in items]
+
+
+@contextmanager
+def profile(path=None, mode='sample', top=30):
+    """pathを指定したときだけプロファイルを取り、保存して上位を表示する（Noneなら何もしない）
+
+    mode='sample' は全スレッドのサンプリング（結果はJSON）、'cprofile' は呼び出したスレッドのcProfile。
+    """
+    if not path:
+        yield None
+        return
+    if mode == 'sample':
+        sampler = SamplingProfiler().start()
+        try:
+            yield sampler
+        finally:
+            sampler.stop()
+            stats = sampler.stats(top)
+            print(f"\nサンプリング結果（{sampler.samples} サンプル、自身の時間の多い順）:")
+            for entry in stats[:top]:
+                print(f"  {entry['self']:>6} {entry['total']:>6}  {entry['function']}")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'samples': sampler.samples, 'interval': sampler.interval, 'functions': stats},
+                          f, ensure_ascii=False, indent=2)
+            print(f"プロファイルを {path} に保存しました")
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+        print(stream.getvalue())
+        print(f"プロファイルを {path} に保存しました（snakeviz や python -m pstats で確認できます）")
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MinHash LSHによる配信記事の重複（ほぼ同じ内容の別URL）の検出
+
+見出しと本文の先頭を正規化して文字3-gramに分け、64個のMinHashを記事の指紋にする。
+MinHashは3-gramのハッシュを1回だけ計算し、ハッシュの値で64個の区画に振り分けて区画ごとの最小値を取る
+（One Permutation Hashing）。空の区画は隣の区画の値で埋める。
+指紋を帯（4個ずつ16帯）に分け、帯の値が1つでも一致した記事だけを候補として調べるので、
+登録済みの記事すべてと比べずに済む。候補は一致するMinHashの割合（3-gramの集合の
+Jaccard係数の推定値）が threshold 以上なら同じ記事とみなす。
+
+SimHashは本文が短い（見出し＋200文字）と「（共同）」のような数文字の違いでもビットが大きく揺れるため、
+3-gramの重なりをそのまま推定できるMinHashを使う。
+"""
+
+import hashlib
+import struct
+import threading
+
+from search_index import normalize
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+DEFAULT_THRESHOLD = 0.6
+
+# これより短いテキストは指紋を作らない（「本文なし」どうしを同じ記事とみなさないため）
+MIN_TEXT_LENGTH = 50
+
+# 抽出できなかったときの値（指紋に含めない）
+_PLACEHOLDERS = frozenset(['タイトルなし', '本文なし'])
+
+# 空の区画を埋めるときに、借りた区画までの距離ごとに足す値（区画の値は 2**58 未満）
+_EMPTY_OFFSET = 1 << 58
+_SIGNATURE = struct.Struct(f'<{NUM_PERM}Q')
+
+
+def article_text(article):
+    """指紋の元にするテキスト（見出し・本文の先頭。見出しがなければタイトル）"""
+    headline = article.get('h1') or article.get('title') or ''
+    content = article.get('content_preview') or ''
+    parts = [part for part in (headline, content) if part not in _PLACEHOLDERS]
+    # 空白や改行の違いはサイトごとに異なるので除く
+    return ''.join(normalize(' '.join(parts)).split())
+
+
+def shingles(text):
+    """文字3-gramの集合"""
+    return {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+
+
+def minhash(text):
+    """テキストの文字3-gramから NUM_PERM 個のMinHashを計算"""
+    bins = [None] * NUM_PERM
+    for shingle in shingles(text):
+        # 実行ごとに変わらないよう、組み込みのhash()ではなくblake2bを使う
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        index, value = value % NUM_PERM, value // NUM_PERM
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    if None not in bins:
+        return tuple(bins)
+    # 空の区画は右隣（末尾からは先頭に戻る）の空でない区画の値を、距離に応じてずらして使う
+    signature = list(bins)
+    for index in range(NUM_PERM):
+        if bins[index] is None:
+            distance = 1
+            while bins[(index + distance) % NUM_PERM] is None:
+                distance += 1
+            signature[index] = bins[(index + distance) % NUM_PERM] + distance * _EMPTY_OFFSET
+    return tuple(signature)
+
+
+def fingerprint(article):
+    """記事の指紋（テキストが短すぎればNone）"""
+    text = article_text(article)
+    if len(text) < MIN_TEXT_LENGTH:
+        return None
+    return minhash(text)
+
+
+def similarity(a, b):
+    """2つの指紋から推定したJaccard係数"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def pack(signature):
+    """指紋をSQLiteに保存するバイト列にする"""
+    return _SIGNATURE.pack(*signature)
+
+
+def unpack(data):
+    return _SIGNATURE.unpack(data)
+
+
+class NearDuplicateIndex:
+    """指紋を帯ごとの値で引ける索引（キーは記事のURL）
+
+    check(article) は先に登録された記事とほぼ同じならそのURLを返し、
+    そうでなければ記事を登録してNoneを返す。同じURLの記事は重複とみなさず指紋を置き換える。
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, bands=BANDS):
+        if NUM_PERM % bands:
+            raise ValueError(f"bands は {NUM_PERM} の約数にしてください: {bands}")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self._signatures = {}
+        # (帯の番号, 帯の値) → URLの集合
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def _find(self, signature, url=None):
+        checked = set()
+        for key in self._band_keys(signature):
+            for candidate in self._buckets.get(key, ()):
+                if candidate == url or candidate in checked:
+                    continue
+                checked.add(candidate)
+                if similarity(signature, self._signatures[candidate]) >= self.threshold:
+                    return candidate
+        return None
+
+    def _add(self, url, signature):
+        old = self._signatures.get(url)
+        if old is not None:
+            for key in self._band_keys(old):
+                self._buckets[key].discard(url)
+        self._signatures[url] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(url)
+
+    def find(self, article, signature=None):
+        """ほぼ同じ内容の登録済み記事のURL（なければNone）"""
+        signature = fingerprint(article) if signature is None else signature
+        if signature is None:
+            return None
+        with self._lock:
+            return self._find(signature, article.get('url'))
+
+    def add(self, url, signature):
+        """指紋を登録"""
+        if signature is None:
+            return
+        with self._lock:
+            self._add(url, signature)
+
+    def add_many(self, items):
+        """(URL, 指紋) の組をまとめて登録し、件数を返す"""
+        count = 0
+        with self._lock:
+            for url, signature in items:
+                if signature is not None:
+                    self._add(url, signature)
+                    count += 1
+        return count
+
+    def check(self, article, signature=None):
+        """重複ならその元の記事のURLを返し、そうでなければ登録してNoneを返す"""
+        signature = fingerprint(article) if signature is None else signature
+        if signature is None:
+            return None
+        url = article.get('url')
+        with self._lock:
+            original = self._find(signature, url)
+            if original is None:
+                self._add(url, signature)
+            return original
+
+
+def drop_near_duplicates(articles, index=None):
+    """記事の並び順で先に出てきたものを残し、ほぼ同じ内容の記事を除く"""
+    index = index if index is not None else NearDuplicateIndex()
+    return [article for article in articles if index.check(article) is None]
@@ -5,170 +5,505 @@
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-import pandas as pd
-from fake_useragent import UserAgent
-import time
 import json
 from datetime import datetime
 import re
+import os
+import time
+import argparse
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import HostRateLimiter
+from http_cache import HTTPCache, CachedSession
+from encoding_resolver import EncodingResolver
+from article_extractor import ArticleExtractor, HeadExtractor, DATE_PATTERNS, DEFAULT_CONTENT_SELECTORS
+from url_frontier import URLFrontier, resolve_link
+from article_index import ArticleIndex
+from article_sink import JSONLSink, CSVSink, MultiSink, compact_jsonl, import_json, iter_jsonl
+from article_store import ArticleStore
+from user_agents import UserAgentPool
+from metrics import Metrics, profile
+from parse_pipeline import ArticlePipeline, article_from_fields
+from site_config import SHARD_MODES, Shard, load_sites
+from near_duplicate import NearDuplicateIndex
+from resilience import (CIRCUIT_OPEN, CLIENT, RETRYABLE, CircuitBreaker, RetryPolicy, classify_exception,
+                        classify_status, parse_retry_after)
+
+# 記事らしいURLのパターンと優先度（一致したものの合計が大きいほど先に取得）
+ARTICLE_PATTERNS = [
+    (r'\d{4}/\d{2}/\d{2}', 5),  # 日付パターン
+    (r'/article/', 4),
+    (r'/story/', 3),
+    (r'/post/', 3),
+    (r'/news/', 2),
+]
+
+# 接続までのタイムアウト（落ちているホストは読み込みのタイムアウトを待たずに失敗させる）
+CONNECT_TIMEOUT = 5
+
+# 記事の本文をストリームで読むときの単位と、<head> だけを読む場合の上限
+STREAM_CHUNK_SIZE = 16 * 1024
+HEAD_BYTES = 64 * 1024
 
 class NewsScraper:
-    def __init__(self):
-        self.ua = UserAgent()
-        self.session = requests.Session()
+    def __init__(self, max_workers=8, delay=1.0, rate_limiter=None, cache=None, index=None, sink=None,
+                 user_agents=None, metrics=None, parse_processes=0, shard=None, dedupe=None,
+                 retry=None, breaker=None, max_bytes=None, head_only=False, head_bytes=HEAD_BYTES):
+        # 同梱のUser-Agentからホストごとに選ぶ（起動時にデータの読み込みや通信をしない）
+        self.ua = user_agents or UserAgentPool()
+        self.max_workers = max_workers
+        # cacheにHTTPCacheを渡すと条件付きリクエストで再取得を省く
+        self.cache = cache
+        self.session = CachedSession(cache)
+        # 並列取得時にコネクションを使い回せるようプールを広げる
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
-            'User-Agent': self.ua.random,
+            'User-Agent': self.ua.get(),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'ja,en-US;q=0.7,en;q=0.3',
             'Accept-Encoding': 'gzip, deflate',
             'Connection': 'keep-alive',
         })
+        # ホストごとのレート制限（delayは robots.txt に指定がない場合の間隔）
+        self.rate_limiter = rate_limiter or HostRateLimiter(default_delay=delay, session=self.session)
+        # 一時的な失敗の再試行と、失敗が続くホストへのリクエストの停止
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.encoding_resolver = EncodingResolver()
+        self.extractor = ArticleExtractor()
+        # サイトの設定でセレクターを指定したホストの抽出器（configure_site で登録）
+        self.site_extractors = {}
+        # 全サイトで共通の取得済みURL（同じ記事を二重に取得しない）
+        self.frontier = URLFrontier()
+        # indexにArticleIndexを渡すと、既知の記事を飛ばす差分クロールになる
+        self.index = index
+        # sinkを渡すと、記事を取得したそばから書き出す（途中で落ちても失われない）
+        self.sink = sink
+        # metricsにMetricsを渡すと処理段階ごとの時間と件数を記録する（既定は記録しない）
+        self.metrics = metrics or Metrics(enabled=False)
+        # parse_processesを指定すると、記事の解析をプロセスプールで行う（取得はスレッドのまま）
+        self.pipeline = ArticlePipeline(self, parse_workers=parse_processes) if parse_processes else None
+        # shardを渡すと、担当するシャードの記事だけを取得する（Shard の mode='url' の場合）
+        self.shard = shard
+        # dedupeにNearDuplicateIndexを渡すと、他のサイトの記事とほぼ同じ内容の記事（配信記事の転載）を除く
+        self.dedupe = dedupe
+        # max_bytesを指定すると、記事の本文をストリームで読み、超えた分は読まずに接続を閉じる
+        self.max_bytes = max_bytes
+        # head_onlyなら記事の <head>（最大head_bytes）だけを読み、タイトル・説明・公開日時だけを取得する
+        # （index・sinkには本文を取得する場合と別のものを渡す。main では head_only_path のファイルになる）
+        self.head_only = head_only
+        self.head_bytes = head_bytes
     
     def scrape_news_site(self, url, max_articles=10):
         """ニュースサイトから記事情報を取得"""
+        return self.crawl_site(url, max_articles)[1]
+    
+    def crawl_site(self, url, max_articles=10, keep=None):
+        """ニュースサイトから記事情報を取得し、(記事数, 記事の一覧) を返す
+        
+        keepを指定すると一覧には先頭のkeep件だけを残す（sinkに書き出す場合に全件をメモリに持たない）。
+        """
         try:
             print(f"ニュースサイトをスクレイピング中: {url}")
             
             # ページを取得
-            response = self.session.get(url, timeout=15)
+            response = self._get(url, timeout=15)
             response.raise_for_status()
-            response.encoding = response.apparent_encoding
             
-            soup = BeautifulSoup(response.text, 'lxml')
+            # 前回から変わっていなければリンク抽出をやり直さない
+            scored_links = self._parsed_from_cache(url, response, 'links')
+            if scored_links is None:
+                with self.metrics.timer('encoding', url):
+                    self.encoding_resolver.apply(response)
+                
+                with self.metrics.timer('parse_links', url):
+                    soup = BeautifulSoup(response.text, 'lxml')
+                    
+                    # 記事のリンクを探す（一般的なパターン）
+                    article_links = soup.find_all('a', href=True)
+                    
+                    scored_links = []
+                    for link in article_links:
+                        href = link.get('href')
+                        text = link.get_text().strip()
+                        
+                        # 記事らしいリンクかチェック
+                        score = self._article_link_score(href, text)
+                        if score:
+                            # ページのURLを基準に絶対URLにして正規化
+                            full_url = resolve_link(response.url or url, href)
+                            if full_url:
+                                scored_links.append((full_url, score))
+                
+                self._store_parsed(url, 'links', scored_links)
             
-            articles = []
+            # サイトのページ自身へのリンク（ナビゲーションなど）は記事にしない
+            own_urls = {resolve_link(url, url), resolve_link(url, response.url or url)}
+            scored_links = [(link, score) for link, score in scored_links if link not in own_urls]
             
-            # 記事のリンクを探す（一般的なパターン）
-            article_links = soup.find_all('a', href=True)
+            # 重複と取得済みを除き、記事らしさの強い順に並べる
+            candidates = self.frontier.prioritize(scored_links)
+            if self.shard:
+                # 記事のURLで分ける場合は担当分だけにし、記事数もシャードの数で分ける
+                candidates = [candidate for candidate in candidates if self.shard.owns_url(candidate)]
+                max_articles = self.shard.max_articles(max_articles)
+            return self._fetch_articles(candidates, max_articles, keep)
             
-            for link in article_links:
-                if len(articles) >= max_articles:
-                    break
-                
-                href = link.get('href')
-                text = link.get_text().strip()
-                
-                # 記事らしいリンクかチェック
-                if self._is_article_link(href, text):
-                    # 相対URLを絶対URLに変換
-                    if href.startswith('/'):
-                        full_url = url.rstrip('/') + href
-                    elif href.startswith('http'):
-                        full_url = href
-                    else:
+        except Exception as e:
+            self._record_error(url, e, "エラー")
+            return 0, []
+    
+    def scrape_sites(self, urls, max_articles=10):
+        """複数のニュースサイトを並列にスクレイピング"""
+        if not urls:
+            return {}
+        workers = min(self.max_workers, len(urls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda site: self.scrape_news_site(site, max_articles), urls)
+            return dict(zip(urls, results))
+    
+    def configure_site(self, site):
+        """サイトの設定（SiteConfig）のセレクターとリクエスト間隔をホストに適用"""
+        extractor = ArticleExtractor(site.content_selectors) if site.content_selectors else None
+        for host in site.hosts:
+            if extractor:
+                self.site_extractors[host] = extractor
+            if site.delay is not None:
+                self.rate_limiter.set_delay(host, site.delay)
+            elif site.rate is not None:
+                self.rate_limiter.set_rate(host, site.rate)
+    
+    def scrape_configured_sites(self, sites, keep=None):
+        """設定ファイルのサイトを、サイトごとの記事数で並列にスクレイピング
+        
+        サイトのURLごとに (記事数, 記事の一覧) を返す（keepは crawl_site と同じ）。
+        """
+        if not sites:
+            return {}
+        for site in sites:
+            self.configure_site(site)
+        workers = min(self.max_workers, len(sites))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(lambda site: self.crawl_site(site.url, site.max_articles, keep), sites)
+            return dict(zip((site.url for site in sites), results))
+    
+    def _extractor_for(self, url):
+        """URLのホストに設定されたセレクターの抽出器（なければ汎用の抽出器）"""
+        if self.site_extractors:
+            return self.site_extractors.get(urlparse(url).netloc.lower(), self.extractor)
+        return self.extractor
+    
+    def _fetch_articles(self, candidates, max_articles, keep=None):
+        """候補URLを並列に取得し、候補の順で最大max_articles件の (記事数, 記事の一覧) を返す
+        
+        一覧に残すのは先頭のkeep件まで（Noneなら全件）。
+        """
+        count = 0
+        articles = []
+        pending = iter(candidates)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # 不足分だけをまとめて取得し、失敗があれば次の候補で補う
+            while count < max_articles:
+                batch = []
+                for candidate in pending:
+                    # 前回までに取得済みで再確認の時期でない記事は飛ばす
+                    if self.index and not self.index.should_fetch(candidate):
                         continue
-                    
-                    # 記事の詳細を取得
-                    article_info = self._get_article_info(full_url)
-                    if article_info:
-                        articles.append(article_info)
-                        time.sleep(1)  # サーバーに負荷をかけないよう待機
+                    # 失敗が続いて止めているホストの記事は飛ばす（取得済みにはしない）
+                    if self.breaker.is_open(candidate):
+                        self.metrics.count('skipped', url=candidate)
+                        continue
+                    # 他のサイトで取得済み（取得中）の記事は飛ばす
+                    if self.frontier.claim(candidate):
+                        batch.append(candidate)
+                        if len(batch) >= max_articles - count:
+                            break
+                if not batch:
+                    break
+                if self.pipeline:
+                    fetched = self.pipeline.map(batch)
+                else:
+                    fetched = executor.map(self._get_article_info, batch)
+                for article_info in fetched:
+                    # 再確認した記事は内容が変わっていた場合だけ結果に含める
+                    if article_info and (self.index is None or self.index.record(article_info)):
+                        if self._is_near_duplicate(article_info):
+                            continue
+                        count += 1
+                        if keep is None or len(articles) < keep:
+                            articles.append(article_info)
+                        self.metrics.count('articles', url=article_info['url'])
+                        if self.sink:
+                            with self.metrics.timer('sink', article_info['url']):
+                                self.sink.write(article_info)
+        return count, articles
+    
+    def _is_near_duplicate(self, article):
+        """取得済みの記事とほぼ同じ内容ならTrue（重複として数える）"""
+        if self.dedupe is None:
+            return False
+        original = self.dedupe.check(article)
+        if original is None:
+            return False
+        print(f"重複記事を除外: {article['url']}（{original} とほぼ同じ）")
+        self.metrics.count('duplicates', url=article['url'])
+        return True
+    
+    def _get(self, url, timeout, stream=False):
+        """レート制限を守ってGET（キャッシュから返せる場合は待たない）
+        
+        タイムアウト・接続エラー・429・5xx は self.retry に従って間隔を空けて再試行する。
+        失敗が続いたホストは self.breaker が止め、その間は送らずに CircuitOpenError になる。
+        再試行しても失敗した場合は最後の例外を送出するか、エラーのレスポンスを返す。
+        stream=True なら本文を読まずに返す（_read_streamed で読む）。
+        """
+        attempt = 0
+        while True:
+            self.breaker.allow(url)
+            response = error = None
+            try:
+                response = self._send(url, timeout, stream)
+            except requests.RequestException as e:
+                error = e
+                kind = classify_exception(e)
+            except BaseException:
+                # キャッシュの読み書きなどの失敗はホストの失敗として数えないが、止めたままにもしない
+                self.breaker.release_probe(url)
+                raise
+            else:
+                kind = classify_status(response.status_code)
+                if kind is None or kind == CLIENT:
+                    # 404などはページの問題なので、ホストは正常とみなす
+                    self.breaker.record_success(url)
+                    return response
             
-            return articles
+            self.metrics.count(f'failures_{kind}', url=url)
+            status = response.status_code if response is not None else None
+            retry_after = None
+            if status in (429, 503):
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            delay = self.retry.delay(attempt, retry_after) if self.retry.should_retry(attempt, kind, status) else None
+            if delay is None:
+                # 再試行しない。Retry-After が長すぎる場合はその間ホストを止める
+                if kind in RETRYABLE:
+                    self.breaker.record_failure(url, open_for=retry_after)
+                else:
+                    self.breaker.release_probe(url)
+                if error is not None:
+                    raise error
+                return response
+            self.breaker.record_failure(url)
+            if response is not None:
+                response.close()
             
-        except Exception as e:
-            print(f"エラー: {e}")
-            return []
+            self.metrics.count('retries', url=url)
+            if retry_after is not None:
+                # 同じホストへの他のリクエストも含めて待たせる（次の acquire で待つ）
+                self.rate_limiter.pause(url, delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+    
+    def _send(self, url, timeout, stream=False):
+        """1回分のGET"""
+        if not self.session.is_fresh(url):
+            # ホストごとの間隔を守るための待ち時間
+            self.metrics.observe('wait', self.rate_limiter.acquire(url) or 0.0, url)
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=(CONNECT_TIMEOUT, timeout), stream=stream,
+                                        headers={'User-Agent': self.ua.get(url)})
+        finally:
+            self.metrics.observe('fetch', time.perf_counter() - start, url)
+        self.metrics.record_response(url, response, stream=stream)
+        return response
+    
+    def _record_error(self, url, error, message="記事の取得に失敗"):
+        """失敗を種類ごとに数えて表示する"""
+        kind = classify_exception(error)
+        if kind == CIRCUIT_OPEN:
+            # 止めたことはブレーカーが表示済みなので、URLごとには表示しない
+            self.metrics.count('skipped', url=url)
+            return
+        print(f"{message}: {url} - {error}")
+        self.metrics.count('errors', url=url)
+        self.metrics.count(f'errors_{kind}', url=url)
+    
+    def _parsed_from_cache(self, url, response, kind):
+        """本文がキャッシュから返された場合、前回の kind（'links' か 'article'）の抽出結果を返す
+        
+        サイトのページと記事が同じURLの場合もあるので、別の種類の抽出結果は使わない。
+        """
+        if self.cache and getattr(response, 'from_cache', False):
+            cached = self.cache.get_parsed(url)
+            if isinstance(cached, dict):
+                return cached.get(kind)
+        return None
+    
+    def _store_parsed(self, url, kind, data):
+        """抽出結果を種類ごとにキャッシュに保存"""
+        if self.cache:
+            self.cache.set_parsed(url, {kind: data})
     
     def _is_article_link(self, href, text):
         """記事のリンクかどうかを判定"""
+        return self._article_link_score(href, text) > 0
+    
+    def _article_link_score(self, href, text):
+        """記事のリンクらしさのスコア（0なら記事ではない）"""
         if not href or not text:
-            return False
+            return 0
         
         # 記事らしいパターンをチェック
-        article_patterns = [
-            r'/article/',
-            r'/news/',
-            r'/story/',
-            r'/post/',
-            r'\d{4}/\d{2}/\d{2}',  # 日付パターン
-        ]
-        
-        for pattern in article_patterns:
-            if re.search(pattern, href):
-                return True
+        score = sum(weight for pattern, weight in ARTICLE_PATTERNS if re.search(pattern, href))
+        if score:
+            return score
         
         # テキストの長さで判定
         if len(text) > 20 and len(text) < 200:
-            return True
+            return 1
         
-        return False
+        return 0
     
     def _get_article_info(self, url):
         """記事の詳細情報を取得"""
+        with self.metrics.timer('article', url):
+            return self._fetch_article_info(url)
+    
+    def _fetch_article_info(self, url):
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            response.encoding = response.apparent_encoding
+            kind, value = self._download_article(url)
+            if kind == 'article':
+                return value
             
-            soup = BeautifulSoup(response.text, 'lxml')
+            # タイトル・見出し・説明・日付・本文を1回の走査で抽出
+            response = value
+            with self.metrics.timer('encoding', url):
+                self.encoding_resolver.apply(response)
+            with self.metrics.timer('extract', url):
+                fields = self._extractor_for(url).extract(response.text)
+            article = article_from_fields(url, fields)
+            self._store_parsed(url, 'article', article)
             
-            # タイトルを取得
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else "タイトルなし"
-            
-            # 見出しを取得
-            h1 = soup.find('h1')
-            h1_text = h1.get_text().strip() if h1 else ""
-            
-            # メタディスクリプションを取得
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            description = meta_desc.get('content', '') if meta_desc else ""
-            
-            # 日付を探す
-            date_text = self._extract_date(soup)
-            
-            # 本文の一部を取得
-            content = self._extract_content(soup)
-            
-            return {
-                'url': url,
-                'title': title_text,
-                'h1': h1_text,
-                'description': description,
-                'date': date_text,
-                'content_preview': content[:200] + "..." if len(content) > 200 else content,
-                'scraped_at': datetime.now().isoformat()
-            }
+            return {**article, 'scraped_at': datetime.now().isoformat()}
             
         except Exception as e:
-            print(f"記事の取得に失敗: {url} - {e}")
+            self._record_error(url, e)
             return None
     
-    def _extract_date(self, soup):
-        """ページから日付を抽出"""
-        # 様々な日付パターンを試す
-        date_patterns = [
-            r'\d{4}年\d{1,2}月\d{1,2}日',
-            r'\d{4}-\d{1,2}-\d{1,2}',
-            r'\d{4}/\d{1,2}/\d{1,2}',
-            r'\d{1,2}/\d{1,2}/\d{4}',
-        ]
+    def _download_article(self, url, raw=False):
+        """記事を取得（HTTPエラーは例外）
+        
+        抽出結果のキャッシュから返せれば ('article', 記事の辞書)、
+        そうでなければ ('response', レスポンス) を返す。raw=True ならレスポンスの代わりに
+        解析ワーカーへ渡す ('raw', (url, 本文のバイト列, Content-Type, 最終URL, セレクター)) を返す。
+        head_only なら <head> だけを読んで ('article', 記事の辞書) を返す。
+        """
+        stream = self.head_only or bool(self.max_bytes)
+        response = self._get(url, timeout=10, stream=stream)
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        
+        # 304などで本文が変わっていなければパースを省く
+        cached = self._parsed_from_cache(url, response, 'article')
+        if isinstance(cached, dict) and cached.get('url'):
+            cached['scraped_at'] = datetime.now().isoformat()
+            return 'article', cached
+        if self.head_only:
+            # <head> だけの結果は本文の抽出結果と異なるのでキャッシュしない
+            head = self._read_streamed(url, response, head_only=True)
+            return 'article', {**article_from_fields(url, head.result()), 'scraped_at': datetime.now().isoformat()}
+        if stream:
+            self._read_streamed(url, response)
+        if raw:
+            extractor = self._extractor_for(url)
+            selectors = tuple(extractor.content_selectors) if extractor is not self.extractor else None
+            return 'raw', (url, response.content, response.headers.get('Content-Type'), response.url, selectors)
+        return 'response', response
+    
+    def _read_streamed(self, url, response, head_only=False):
+        """stream=True で受け取ったレスポンスの本文を読む
+        
+        head_only なら <head> を読み終えるか head_bytes に達した時点で、そうでなければ max_bytes に達した時点で
+        読むのをやめて接続を閉じる。読んだ分を response.content にし、head_only なら HeadExtractor を返す。
+        最後まで読めた本文だけをHTTPキャッシュに保存する。
+        """
+        limit = self.head_bytes if head_only else self.max_bytes
+        head = None
+        body = bytearray()
+        complete = False
+        # 上限より小さいと分かっている本文は最後まで読み、接続を閉じずに使い回す
+        length = response.headers.get('Content-Length', '')
+        drain = bool(limit) and length.isdigit() and int(length) <= limit
+        if getattr(response, 'from_cache', False):
+            body += response.content
+            complete = True
+        else:
+            try:
+                with self.metrics.timer('download', url):
+                    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                        body += chunk
+                        if head_only:
+                            # 文字コードは先頭の sniff_bytes で判定してから解析を始める
+                            if head is None and len(body) >= self.encoding_resolver.sniff_bytes:
+                                head = self._head_extractor(url, response, body)
+                                if head.feed(bytes(body)) and not drain:
+                                    break
+                            elif head is not None and head.feed(chunk) and not drain:
+                                break
+                        if limit and len(body) >= limit:
+                            break
+                    else:
+                        complete = True
+            finally:
+                response.close()
+            self.metrics.count('bytes_downloaded', len(body), url=url)
+            if not complete and not head_only:
+                del body[limit:]
+                self.metrics.count('truncated', url=url)
         
+        response._content = bytes(body)
+        response._content_consumed = True
+        if complete and self.cache and response.status_code == 200 and not getattr(response, 'from_cache', False):
+            self.cache.store(url, response)
+        if not head_only:
+            return None
+        if head is None:
+            head = self._head_extractor(url, response, body)
+            head.feed(response.content)
+        if complete:
+            head.close()
+        return head
+    
+    def _head_extractor(self, url, response, body):
+        encoding = self.encoding_resolver.resolve(bytes(body), response.headers.get('Content-Type'), response.url or url)
+        return HeadExtractor(encoding)
+    
+    def close(self):
+        """解析プロセスを使っていれば終了する"""
+        if self.pipeline:
+            self.pipeline.close()
+    
+    def _extract_date(self, soup):
+        """ページから日付を抽出（BeautifulSoup版）"""
         # テキストから日付を探す
         text = soup.get_text()
-        for pattern in date_patterns:
+        for pattern in DATE_PATTERNS:
             match = re.search(pattern, text)
             if match:
                 return match.group()
         
         return "日付不明"
     
-    def _extract_content(self, soup):
-        """ページから本文を抽出"""
-        # 一般的な本文の要素を探す
-        content_selectors = [
-            'article',
-            '.content',
-            '.post-content',
-            '.entry-content',
-            '.article-body',
-            'main',
-            'p'
-        ]
-        
-        for selector in content_selectors:
+    def _extract_content(self, soup, selectors=None):
+        """ページから本文を抽出（BeautifulSoup版）"""
+        # 指定がなければ一般的な本文の要素を探す
+        for selector in selectors or DEFAULT_CONTENT_SELECTORS:
             elements = soup.select(selector)
             if elements:
                 # 最初の要素からテキストを取得
@@ -178,6 +513,18 @@ class NewsScraper:
         
         return "本文なし"
     
+    def load_articles(self, filename='news_articles.json'):
+        """保存済みの記事データを読み込む"""
+        if not os.path.exists(filename):
+            return []
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        except Exception as e:
+            print(f"読み込みエラー: {e}")
+            return []
+    
     def save_articles(self, articles, filename='news_articles.json'):
         """記事データをJSONファイルに保存"""
         try:
@@ -191,49 +538,235 @@ class NewsScraper:
         """記事データをCSVファイルに保存"""
         try:
             if articles:
-                df = pd.DataFrame(articles)
-                df.to_csv(filename, index=False, encoding='utf-8-sig')
+                with CSVSink(filename, fsync_every=0) as sink:
+                    for article in articles:
+                        sink.write(article)
                 print(f"記事データを {filename} に保存しました")
         except Exception as e:
             print(f"CSV保存エラー: {e}")
 
-def main():
+def head_only_path(path):
+    """--head-only の出力ファイル名（news_articles.json → news_articles.head.json）
+
+    <head> だけの記事で本文を取得した記事を上書きしたり、取得済みとして本文の取得を飛ばしたりしないよう、
+    インデックス・データベースを含めて別のファイルに書き出す。
+    """
+    base, ext = os.path.splitext(path)
+    return f"{base}.head{ext}"
+
+def merge_shards(shard_paths, jsonl_path, json_path, csv_path=None, db_path=None, append=True, dedupe=True):
+    """シャードごとのJSONLを1つにまとめ、JSON・CSV・データベースに書き出す
+
+    append=True なら既存のJSONL（なければ既存のJSON）の後ろに追記する。
+    dedupe=True ならシャードをまたいだ重複（別のサイトの転載記事）と、追記する場合は既存の記事との重複を除く。
+    (まとめた記事数, 書き出した記事数) を返す。
+    """
+    articles = []
+    for path in shard_paths:
+        if not os.path.exists(path):
+            print(f"シャードの出力がありません: {path}")
+            continue
+        articles.extend(iter_jsonl(path))
+    # 同じ記事が複数のシャードにあれば、compact_jsonl で後から来る新しい方が残るよう並べる
+    articles.sort(key=lambda article: article.get('scraped_at') or '')
+    
+    store = None
+    if db_path:
+        # 初めて作る場合は既存のJSONを取り込んでから追加する
+        new_store = not os.path.exists(db_path)
+        store = ArticleStore(db_path)
+        if new_store:
+            store.import_json(json_path)
+    
+    if dedupe:
+        # 先に取得した記事を残し、ほぼ同じ内容の記事を除く
+        index = NearDuplicateIndex()
+        if append and store:
+            index.add_many(store.fingerprints())
+        kept = [article for article in articles if index.check(article) is None]
+        if len(kept) < len(articles):
+            print(f"重複記事を {len(articles) - len(kept)} 件除外しました")
+        articles = kept
+    
+    if append and not os.path.exists(jsonl_path):
+        import_json(json_path, jsonl_path)
+    with JSONLSink(jsonl_path, append=append, fsync_every=0) as sink:
+        for article in articles:
+            sink.write(article)
+    
+    if store:
+        with store:
+            store.write_many(articles)
+    
+    count = compact_jsonl(jsonl_path, json_path, csv_path)
+    return len(articles), count
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="ニュースサイトのスクレイピング")
+    parser.add_argument('--sites', default='sites.json',
+                        help="対象サイトの設定ファイル（なければ既定のサイト）")
+    parser.add_argument('--shard', default=None,
+                        help="i/n の形式で指定すると、n個に分けたうちi番目（0始まり）だけを取得する")
+    parser.add_argument('--shard-by', choices=SHARD_MODES, default='site',
+                        help="site: サイトのホスト単位で分ける / url: 記事のURL単位で分ける")
+    parser.add_argument('--merge', nargs='+', default=None, metavar='JSONL',
+                        help="スクレイピングせず、シャードごとのJSONLをまとめて保存する")
+    parser.add_argument('--incremental', action='store_true',
+                        help="取得済みの記事を飛ばし、結果を既存のデータに統合する")
+    parser.add_argument('--index', default='news_index.sqlite3',
+                        help="差分クロール用のインデックスファイル")
+    parser.add_argument('--recheck-hours', type=float, default=None,
+                        help="取得済みの記事を再確認するまでの時間（省略時は再確認しない）")
+    parser.add_argument('--output', default='news_articles.json', help="記事データのJSONファイル")
+    parser.add_argument('--csv', default='news_articles.csv', help="記事データのCSVファイル")
+    parser.add_argument('--jsonl', default='news_articles.jsonl',
+                        help="取得したそばから追記するJSONLファイル")
+    parser.add_argument('--db', default='news_articles.sqlite3',
+                        help="app.py が読み出す記事データベース（記事は蓄積される）")
+    parser.add_argument('--metrics-json', default='news_metrics.json',
+                        help="処理段階ごとの時間と件数を書き出すJSONファイル（空文字で書き出さない）")
+    parser.add_argument('--metrics-prom', default='news_metrics.prom',
+                        help="同じ内容のPrometheusテキスト形式のファイル（空文字で書き出さない）")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="ほぼ同じ内容の記事（他のサイトの転載記事）も除かずに保存する")
+    parser.add_argument('--head-only', action='store_true',
+                        help="記事の <head> だけを読み、タイトル・説明・公開日時だけを取得する（本文は取得しない）。"
+                             "出力・インデックス・データベースは news_articles.head.json のように別のファイルになる")
+    parser.add_argument('--head-kb', type=int, default=HEAD_BYTES // 1024,
+                        help="--head-only で </head> が見つからない場合に読む上限（KB）")
+    parser.add_argument('--max-kb', type=int, default=2048,
+                        help="記事の本文を読む上限（KB、0なら上限なし）。超えた分は読まずに接続を閉じる")
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help="記事の解析に使うプロセス数（0ならスレッド内で解析）")
+    parser.add_argument('--profile', default=None,
+                        help="指定するとプロファイルを取ってこのファイルに保存する")
+    parser.add_argument('--profile-mode', choices=['sample', 'cprofile'], default='sample',
+                        help="sample: 全スレッドのサンプリング / cprofile: メインスレッドのcProfile")
+    args = parser.parse_args(argv)
+    args.shard_spec = None
+    if args.shard:
+        try:
+            args.shard_spec = Shard.parse(args.shard, args.shard_by)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
+
+def main(argv=None):
     """メイン関数"""
+    args = parse_args(argv)
+    
+    if args.head_only:
+        for name in ('output', 'csv', 'jsonl', 'db', 'index', 'metrics_json', 'metrics_prom'):
+            path = getattr(args, name)
+            setattr(args, name, path and head_only_path(path))
+        print(f"<head> だけを取得します（{args.jsonl} などに別に保存）")
+    
+    if args.merge:
+        # 各シャードの出力を、シャードなしで実行した場合と同じファイルにまとめる
+        print(f"=== シャードの出力をまとめます（{len(args.merge)} ファイル） ===")
+        merged, count = merge_shards(args.merge, args.jsonl, args.output, args.csv, args.db,
+                                     append=args.incremental, dedupe=not args.keep_duplicates)
+        print(f"{merged} 件の記事をまとめ、{args.output} に保存しました（{count} 件）")
+        return
+    
     print("=== ニュースサイトスクレイピング開始 ===")
     
-    scraper = NewsScraper()
+    sites = load_sites(args.sites)
+    shard = args.shard_spec
+    if shard:
+        sites = shard.select_sites(sites)
+        # シャードごとに別のファイルに書き出し、後で --merge でまとめる
+        args.jsonl = shard.path(args.jsonl)
+        args.index = shard.path(args.index)
+        args.metrics_json = args.metrics_json and shard.path(args.metrics_json)
+        args.metrics_prom = args.metrics_prom and shard.path(args.metrics_prom)
+        print(f"シャード {shard}（{args.shard_by}単位）: {len(sites)} サイトを担当")
+    
+    index = None
+    if args.incremental:
+        recheck_after = args.recheck_hours * 3600 if args.recheck_hours is not None else None
+        index = ArticleIndex(args.index, recheck_after=recheck_after)
+        print(f"差分クロール: 既知の記事 {len(index)} 件")
+        # JSONLがまだなければ既存のJSONから作り、今回の記事をその後ろに追記する
+        if not shard and not os.path.exists(args.jsonl):
+            import_json(args.output, args.jsonl)
+    
+    # 転載記事の判定（差分クロールでは保存済みの記事とも比べる。シャードをまたいだ重複は --merge で除く）
+    dedupe = None if args.keep_duplicates else NearDuplicateIndex()
     
-    # スクレイピング対象のサイト（例）
-    target_sites = [
-        "https://www.yahoo.co.jp/news/",
-        "https://www.asahi.com/",
-        "https://www.mainichi.jp/",
-    ]
+    if shard:
+        # シャードでは今回取得した記事だけをJSONLに書き出す（記事がなくても前回の分は残さない）
+        open(args.jsonl, 'w', encoding='utf-8').close()
+        sink = MultiSink(JSONLSink(args.jsonl, append=False))
+    else:
+        # app.py 用のデータベース（初めて作る場合は既存のJSONを取り込む）
+        new_store = not os.path.exists(args.db)
+        store = ArticleStore(args.db)
+        if new_store:
+            store.import_json(args.output)
+        if dedupe is not None and args.incremental:
+            dedupe.add_many(store.fingerprints())
+        
+        # 記事は取得したそばからJSONL・データベース（と、差分クロールでなければCSV）に書き出す
+        # （ファイルは最初の記事を書くときに開くため、1件も取得できなければ前回の出力が残る）
+        sink = MultiSink(
+            JSONLSink(args.jsonl, append=args.incremental),
+            None if args.incremental else CSVSink(args.csv),
+            store,
+        )
     
-    all_articles = []
+    # 前回の取得結果をディスクに残し、変わっていないページは再取得しない
+    metrics = Metrics()
+    scraper = NewsScraper(cache=HTTPCache('.http_cache'), index=index, sink=sink, metrics=metrics,
+                          parse_processes=args.parse_processes, shard=shard, dedupe=dedupe,
+                          max_bytes=args.max_kb * 1024 or None, head_only=args.head_only,
+                          head_bytes=args.head_kb * 1024)
     
-    for site in target_sites:
-        print(f"\n{site} を処理中...")
-        articles = scraper.scrape_news_site(site, max_articles=5)
-        all_articles.extend(articles)
-        print(f"{len(articles)} 件の記事を取得")
+    total = 0
+    examples = []
     
-    if all_articles:
-        print(f"\n合計 {len(all_articles)} 件の記事を取得しました")
+    # サイトごとに並列で取得（同一ホストへの間隔は維持される）
+    # 記事はsinkに書き出すので、手元には表示用の3件だけを残す
+    with sink, profile(args.profile, mode=args.profile_mode):
+        try:
+            results = scraper.scrape_configured_sites(sites, keep=3)
+        finally:
+            scraper.close()
+        for site in sites:
+            count, articles = results[site.url]
+            total += count
+            examples.extend(articles[:3 - len(examples)])
+            print(f"\n{site.url}: {count} 件の記事を取得")
+    
+    if total:
+        print(f"\n合計 {total} 件の記事を取得しました")
         
-        # データを保存
-        scraper.save_articles(all_articles)
-        scraper.save_to_csv(all_articles)
+        if shard:
+            print(f"記事データを {args.jsonl} に保存しました（--merge でまとめます）")
+        else:
+            # JSONLをURLごとにまとめて従来形式のJSON（差分クロールではCSVも）に書き出す
+            with metrics.timer('save'):
+                count = compact_jsonl(args.jsonl, args.output, args.csv if args.incremental else None)
+            print(f"記事データを {args.output} に保存しました（{count} 件）")
         
         # 最初の3件を表示
         print("\n取得した記事の例:")
-        for i, article in enumerate(all_articles[:3], 1):
+        for i, article in enumerate(examples, 1):
             print(f"\n{i}. {article['title']}")
             print(f"   URL: {article['url']}")
             print(f"   日付: {article['date']}")
             print(f"   説明: {article['description'][:100]}...")
+    elif not sites:
+        print("担当するサイトがありません")
+    elif args.incremental:
+        print("新しい記事はありませんでした")
     else:
         print("記事の取得に失敗しました")
+    
+    # どの処理段階に時間がかかったかを書き出す
+    metrics.report()
+    metrics.write(args.metrics_json, args.metrics_prom)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Seleniumのページ待機（固定のtime.sleepの代わりに、使える状態になった時点で次へ進む）
+
+どの関数も実際に待った秒数を返す（条件を満たさずにタイムアウトした場合も例外にはしない）。
+"""
+
+import json
+import time
+
+from selenium.common.exceptions import WebDriverException
+
+# ページの読み込み状態・セレクター・高さを確認する間隔（秒）
+POLL_INTERVAL = 0.1
+
+# ネットワークの状態を知るためのパフォーマンスログのイベント
+_REQUEST_STARTED = 'Network.requestWillBeSent'
+_REQUEST_FINISHED = ('Network.loadingFinished', 'Network.loadingFailed')
+
+
+def _poll(condition, timeout, interval=POLL_INTERVAL):
+    """conditionが真になるかtimeoutまで待ち、(結果, 待った秒数) を返す"""
+    start = time.monotonic()
+    while True:
+        try:
+            result = condition()
+        except WebDriverException:
+            result = None
+        elapsed = time.monotonic() - start
+        if result or elapsed >= timeout:
+            return result, elapsed
+        time.sleep(min(interval, timeout - elapsed))
+
+
+def wait_for_ready_state(driver, timeout=10, state='complete'):
+    """document.readyState が state になるまで待つ（'interactive' ならDOMの構築完了まで）"""
+    states = ('interactive', 'complete') if state == 'interactive' else ('complete',)
+    _, elapsed = _poll(lambda: driver.execute_script("return document.readyState") in states, timeout)
+    return elapsed
+
+
+def wait_for_selector(driver, selectors, timeout=10):
+    """いずれかのセレクターに一致する要素が現れるまで待ち、(一致したセレクター, 待った秒数) を返す"""
+    if isinstance(selectors, str):
+        selectors = [selectors]
+    script = """
+    for (const selector of arguments[0]) {
+        try {
+            if (document.querySelector(selector)) return selector;
+        } catch (e) {}
+    }
+    return null;
+    """
+    return _poll(lambda: driver.execute_script(script, list(selectors)), timeout)
+
+
+def _performance_log(driver):
+    """パフォーマンスログのイベントを取り出す（ログが有効でなければNone）"""
+    try:
+        entries = driver.get_log('performance')
+    except (WebDriverException, AttributeError):
+        return None
+    events = []
+    for entry in entries:
+        try:
+            events.append(json.loads(entry['message'])['message'])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return events
+
+
+def wait_for_network_idle(driver, idle_time=0.5, timeout=10):
+    """通信中のリクエストがない状態が idle_time 秒続くまで待つ
+
+    ドライバーのパフォーマンスログ（goog:loggingPrefs）が有効ならCDPのNetworkイベントで
+    通信中のリクエストを数え、無効ならResource Timingの件数が増えなくなるまでを待つ。
+    """
+    start = time.monotonic()
+    inflight = set()
+    last_activity = start
+    # ログが有効かの確認で取り出したイベント（読み込み中に始まったリクエスト）も数える
+    events = _performance_log(driver)
+    use_log = events is not None
+    last_count = None
+
+    while True:
+        now = time.monotonic()
+        if use_log:
+            if events is None:
+                events = _performance_log(driver) or []
+            for event in events:
+                method = event.get('method')
+                request_id = event.get('params', {}).get('requestId')
+                if method == _REQUEST_STARTED:
+                    inflight.add(request_id)
+                    last_activity = now
+                elif method in _REQUEST_FINISHED:
+                    inflight.discard(request_id)
+                    last_activity = now
+            events = None
+        else:
+            try:
+                count = driver.execute_script("return performance.getEntriesByType('resource').length")
+            except WebDriverException:
+                count = last_count
+            if count != last_count:
+                last_count = count
+                last_activity = now
+
+        elapsed = now - start
+        if (not inflight and now - last_activity >= idle_time) or elapsed >= timeout:
+            return elapsed
+        time.sleep(POLL_INTERVAL)
+
+
+def wait_for_scroll_growth(driver, last_height, timeout=2):
+    """scrollHeight が last_height より大きくなるまで待ち、(新しい高さ, 待った秒数) を返す
+
+    timeout までに増えなければ、その時点の高さ（= これ以上読み込まれない）を返す。
+    """
+    heights = []
+
+    def grown():
+        height = driver.execute_script("return document.body.scrollHeight")
+        heights.append(height)
+        return height > last_height
+
+    _, elapsed = _poll(grown, timeout)
+    return (heights[-1] if heights else last_height), elapsed
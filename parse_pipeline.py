@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記事の取得（I/O）と解析（CPU）を分けたパイプライン
+
+I/Oスレッドが記事の本文をバイト列のまま取得し、上限付きのキューを通して
+プロセスプールの解析ワーカーに渡す。解析ワーカーは文字コードの判定・デコード・抽出を行い、
+記事の辞書だけを返す。プロセス間を行き来するのはバイト列と結果の辞書だけ。
+解析が追いつかなければキューが埋まって取得側が待つので、メモリに溜め込まない。
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from article_extractor import ArticleExtractor
+from encoding_resolver import EncodingResolver
+
+# 解析ワーカーのプロセスごとに1つずつ作る（抽出器はセレクターの組ごと）
+_extractors = {}
+_resolver = None
+
+
+def article_from_fields(url, fields):
+    """抽出結果から記事の辞書（scraped_at を除く）を作る"""
+    content = fields['content']
+    return {
+        'url': url,
+        'title': fields['title'],
+        'h1': fields['h1'],
+        'description': fields['description'],
+        'date': fields['date'],
+        'content_preview': content[:200] + "..." if len(content) > 200 else content,
+    }
+
+
+def parse_article(url, content, content_type=None, final_url=None, content_selectors=None):
+    """解析ワーカーで実行: 本文のバイト列から (記事の辞書, 解析にかかった秒数) を返す"""
+    global _resolver
+    if _resolver is None:
+        _resolver = EncodingResolver()
+    extractor = _extractors.get(content_selectors)
+    if extractor is None:
+        extractor = _extractors[content_selectors] = ArticleExtractor(content_selectors)
+    start = time.perf_counter()
+    encoding = _resolver.resolve(content, content_type, final_url or url)
+    try:
+        text = str(content, encoding, errors='replace')
+    except (LookupError, TypeError):
+        # requestsと同じく、未知の文字コードはUTF-8として読む
+        text = str(content, errors='replace')
+    article = article_from_fields(url, extractor.extract(text))
+    return article, time.perf_counter() - start
+
+
+def default_parse_workers():
+    """既定の解析プロセス数（CPUコア数）"""
+    return os.cpu_count() or 1
+
+
+class ArticlePipeline:
+    """NewsScraperの記事取得を、I/Oスレッドと解析プロセスの2段に分けて行う
+
+    parse_workers : 解析プロセスの数
+    queue_size    : 取得済みで解析待ちの本文を溜めておける数（超えると取得側が待つ）
+    """
+
+    def __init__(self, scraper, parse_workers=None, queue_size=None):
+        self.scraper = scraper
+        self.parse_workers = parse_workers or default_parse_workers()
+        self.queue_size = queue_size or self.parse_workers * 2
+        self._processes = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # プロセスの起動は重いので、最初に使うときに作って使い回す
+        # （スレッドが動いている中でforkしないよう spawn で起動する）
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.parse_workers,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            return self._processes
+
+    def map(self, urls):
+        """記事を取得・解析し、urlsの順に結果（失敗はNone）を返す"""
+        urls = list(urls)
+        results = [None] * len(urls)
+        if not urls:
+            return results
+        fetched = queue.Queue(maxsize=self.queue_size)
+
+        def download(index, url):
+            try:
+                item = self.scraper._download_article(url, raw=True)
+            except Exception as e:
+                self.scraper._record_error(url, e)
+                item = None
+            # 解析待ちが溜まっていればここで待つ
+            fetched.put((index, url, item))
+
+        pool = self._pool()
+        pending = {}
+
+        def collect(futures):
+            for future in futures:
+                index, url = pending.pop(future)
+                try:
+                    article, seconds = future.result()
+                except Exception as e:
+                    print(f"記事の解析に失敗: {url} - {e}")
+                    self.scraper.metrics.count('errors', url=url)
+                    continue
+                self.scraper.metrics.observe('parse', seconds, url)
+                self.scraper._store_parsed(url, 'article', article)
+                results[index] = {**article, 'scraped_at': datetime.now().isoformat()}
+
+        with ThreadPoolExecutor(max_workers=self.scraper.max_workers) as io:
+            for index, url in enumerate(urls):
+                io.submit(download, index, url)
+
+            for _ in urls:
+                index, url, item = fetched.get()
+                if item is None:
+                    continue
+                kind, value = item
+                if kind == 'article':
+                    # 抽出結果のキャッシュから返せた記事
+                    results[index] = value
+                    continue
+                pending[pool.submit(parse_article, *value)] = (index, url)
+                # 解析中の数も上限までに抑える
+                while len(pending) >= self.queue_size:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    collect(done)
+
+        collect(list(pending))
+        return results
+
+    def close(self):
+        """解析プロセスを終了する"""
+        with self._lock:
+            if self._processes is not None:
+                self._processes.shutdown()
+                self._processes = None
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ホストごとのトークンバケット式レート制限
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+
+class TokenBucket:
+    """トークンバケット（rate: 1秒あたりのトークン数, capacity: バースト上限）"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        # 最後にトークンを補充した時刻（pause() の間は再開の時刻になり、それまではトークンを貯めない）
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """レートを変更"""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        if now <= self._updated:
+            return
+        if self.rate > 0:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        else:
+            self._tokens = self.capacity
+        self._updated = now
+
+    def pause(self, seconds):
+        """今から seconds 秒間はトークンを出さない（Retry-After など）
+
+        待っているリクエストは再開の時刻からレートどおりの間隔で順に通す。
+        """
+        with self._lock:
+            self._refill()
+            self._updated = max(self._updated, time.monotonic() + seconds)
+
+    def reserve(self):
+        """トークンを1つ予約し、使えるようになるまでの待ち時間（秒）を返す"""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            paused = max(self._updated - time.monotonic(), 0.0)
+            if self._tokens >= 0 or self.rate <= 0:
+                return paused
+            # 不足分は借りとして残し、後続の呼び出しがさらに待つ
+            return paused - self._tokens / self.rate
+
+    def acquire(self):
+        """トークンが使えるようになるまで待機し、待った秒数を返す"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def parse_crawl_delay(robots_text, user_agent='*'):
+    """robots.txt から Crawl-delay を取得（urllib.robotparser と違い小数も扱う）"""
+    agent = user_agent.split('/')[0].lower()
+    groups = []
+    agents, delay, in_rules = [], None, False
+    for raw in robots_text.splitlines():
+        line = raw.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = (part.strip() for part in line.split(':', 1))
+        key = key.lower()
+        if key == 'user-agent':
+            if in_rules:
+                groups.append((agents, delay))
+                agents, delay, in_rules = [], None, False
+            agents.append(value.lower())
+        elif agents:
+            in_rules = True
+            if key == 'crawl-delay':
+                try:
+                    delay = float(value)
+                except ValueError:
+                    pass
+    if agents:
+        groups.append((agents, delay))
+
+    default = None
+    for agents, delay in groups:
+        for name in agents:
+            if name == '*':
+                if default is None:
+                    default = delay
+            elif agent != '*' and name in agent:
+                return delay
+    return default
+
+
+class HostRateLimiter:
+    """ホストごとにトークンバケットを持つレート制限
+
+    間隔は「明示的な設定 > robots.txt の Crawl-delay / Request-rate > default_delay」
+    の順で決まる。待機は該当ホストのスレッドだけをブロックする。
+    """
+
+    def __init__(self, default_delay=1.0, session=None, user_agent='*',
+                 respect_robots=True, host_delays=None, robots_timeout=5):
+        self.default_delay = default_delay
+        self.session = session
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.robots_timeout = robots_timeout
+        self._explicit = dict(host_delays or {})
+        self._robots_delays = {}
+        self._buckets = {}
+        self._host_locks = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def _host(url):
+        parsed = urlparse(url)
+        return (parsed.netloc or parsed.path).lower()
+
+    def _host_lock(self, host):
+        with self._guard:
+            return self._host_locks.setdefault(host, threading.Lock())
+
+    def set_delay(self, host, delay):
+        """ホストのリクエスト間隔（秒）を明示的に設定"""
+        host = self._host(host)
+        self._explicit[host] = delay
+        bucket = self._buckets.get(host)
+        if bucket:
+            bucket.set_rate(self._rate_for(delay))
+
+    def set_rate(self, host, rate):
+        """ホストのレート（リクエスト/秒）を明示的に設定"""
+        self.set_delay(host, 1.0 / rate if rate > 0 else 0)
+
+    @staticmethod
+    def _rate_for(delay):
+        return 1.0 / delay if delay and delay > 0 else 0
+
+    def crawl_delay(self, url):
+        """robots.txt の Crawl-delay（なければ Request-rate から換算）を取得（キャッシュ付き）"""
+        host = self._host(url)
+        if host in self._robots_delays:
+            return self._robots_delays[host]
+        scheme = urlparse(url).scheme or 'https'
+        delay = None
+        try:
+            getter = self.session.get if self.session else requests.get
+            response = getter(f"{scheme}://{host}/robots.txt", timeout=self.robots_timeout)
+            if response.status_code == 200:
+                delay = parse_crawl_delay(response.text, self.user_agent)
+                if delay is None:
+                    parser = RobotFileParser()
+                    parser.parse(response.text.splitlines())
+                    request_rate = parser.request_rate(self.user_agent)
+                    if request_rate and request_rate.requests:
+                        delay = request_rate.seconds / request_rate.requests
+        except Exception as e:
+            print(f"robots.txt の取得に失敗: {host} - {e}")
+        self._robots_delays[host] = float(delay) if delay is not None else None
+        return self._robots_delays[host]
+
+    def delay_for(self, url):
+        """ホストに適用される間隔（秒）を返す"""
+        host = self._host(url)
+        if host in self._explicit:
+            return self._explicit[host]
+        if self.respect_robots:
+            delay = self.crawl_delay(url)
+            if delay is not None:
+                return delay
+        return self.default_delay
+
+    def _bucket(self, url):
+        host = self._host(url)
+        bucket = self._buckets.get(host)
+        if bucket:
+            return bucket
+        # robots.txt の取得中も他のホストは待たせない
+        with self._host_lock(host):
+            bucket = self._buckets.get(host)
+            if not bucket:
+                bucket = TokenBucket(self._rate_for(self.delay_for(url)))
+                self._buckets[host] = bucket
+        return bucket
+
+    def acquire(self, url):
+        """URLのホストへリクエストできるまで待機し、待った秒数を返す"""
+        return self._bucket(url).acquire()
+
+    def pause(self, url, seconds):
+        """URLのホストへのリクエストを seconds 秒間止める（待っている他のスレッドも含む）"""
+        self._bucket(url).pause(seconds)
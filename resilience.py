@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+失敗の分類・指数バックオフによる再試行・ホストごとのサーキットブレーカー
+
+落ちている・制限をかけているホストに対して、残りのリンクを1件ずつタイムアウトまで待つのではなく、
+一時的な失敗は間隔を空けて再試行し、失敗が続くホストへのリクエストはしばらく止めて即座に失敗させる。
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+# 失敗の種類
+TIMEOUT = 'timeout'          # 接続・読み込みのタイムアウト
+CONNECTION = 'connection'    # 名前解決・接続の失敗
+THROTTLED = 'throttled'      # 429 Too Many Requests
+SERVER = 'server'            # 5xx
+CLIENT = 'client'            # 404 などの 4xx（再試行しても変わらない）
+OTHER = 'other'
+CIRCUIT_OPEN = 'circuit_open'  # サーキットブレーカーで止めているホスト
+
+# 再試行する失敗（サーキットブレーカーでもこれらを失敗として数える）
+RETRYABLE = frozenset([TIMEOUT, CONNECTION, THROTTLED, SERVER])
+
+# 再試行する状態コード
+RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+def _host(url):
+    return urlparse(url).netloc.lower()
+
+
+def classify_status(status_code):
+    """状態コードの失敗の種類（成功・リダイレクト・304ならNone）"""
+    if status_code < 400:
+        return None
+    if status_code == 429:
+        return THROTTLED
+    if status_code == 408:
+        return TIMEOUT
+    if status_code >= 500:
+        return SERVER
+    return CLIENT
+
+
+def classify_exception(error):
+    """例外の失敗の種類"""
+    if isinstance(error, requests.Timeout):
+        return TIMEOUT
+    if isinstance(error, requests.ConnectionError):
+        return CONNECTION
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return classify_status(error.response.status_code) or OTHER
+    if isinstance(error, CircuitOpenError):
+        return error.kind
+    return OTHER
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After ヘッダー（秒数またはHTTPの日時）を秒数にする（解釈できなければNone）"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max((when - now).total_seconds(), 0.0)
+
+
+class CircuitOpenError(requests.RequestException):
+    """サーキットブレーカーが開いているホストへのリクエスト（送らずに失敗させる）"""
+
+    kind = CIRCUIT_OPEN
+
+    def __init__(self, host, retry_in):
+        super().__init__(f"{host} へのリクエストを停止中（あと {retry_in:.0f} 秒）")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """再試行の回数と待ち時間
+
+    待ち時間は backoff * 2**試行回数 を上限とした一様乱数（full jitter）で、max_backoff で頭打ちにする。
+    Retry-After があればその秒数を待つが、max_retry_after より長ければ再試行しない。
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0, max_retry_after=60.0,
+                 retry_statuses=RETRY_STATUSES, seed=None):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = frozenset(retry_statuses)
+        self._random = random.Random(seed)
+
+    def should_retry(self, attempt, kind, status_code=None):
+        """attempt回目（0始まり）の失敗のあとに再試行するかどうか"""
+        if attempt >= self.max_retries or kind not in RETRYABLE:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        """次の試行までの待ち時間（秒）。Retry-After が長すぎる場合はNone"""
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        return self._random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+class _Circuit:
+    def __init__(self):
+        self.failures = 0
+        self.opened_until = 0.0
+        self.probing = False
+
+
+class CircuitBreaker:
+    """ホストごとのサーキットブレーカー
+
+    連続して failure_threshold 回失敗したホストは reset_timeout 秒のあいだ開き、
+    リクエストを送らずに CircuitOpenError で失敗させる。時間が過ぎたら1件だけ試し（半開）、
+    成功すれば閉じ、失敗すればまた開く。
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, host):
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit()
+        return circuit
+
+    def allow(self, url):
+        """リクエストしてよければ何もせず、止めているホストなら CircuitOpenError を送出"""
+        host = _host(url)
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or not circuit.opened_until:
+                return
+            remaining = circuit.opened_until - time.monotonic()
+            if remaining > 0 or circuit.probing:
+                raise CircuitOpenError(host, max(remaining, 0))
+            # 止めていた時間が過ぎたので、このリクエストだけを試しに通す
+            circuit.probing = True
+
+    def release_probe(self, url):
+        """試しに通したリクエストがホストの状態と関係なく終わった場合に、次のリクエストを試せるようにする"""
+        with self._lock:
+            circuit = self._circuits.get(_host(url))
+            if circuit is not None:
+                circuit.probing = False
+
+    def record_success(self, url):
+        host = _host(url)
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None:
+                if circuit.opened_until:
+                    print(f"{host} へのリクエストを再開します")
+                self._circuits[host] = _Circuit()
+
+    def record_failure(self, url, open_for=None):
+        """失敗を数える（open_forを指定すると回数に関係なくその秒数だけ止める）"""
+        host = _host(url)
+        with self._lock:
+            circuit = self._circuit(host)
+            circuit.failures += 1
+            now = time.monotonic()
+            # 開いている間に終わった他のリクエストの失敗では開き直さない
+            already_open = circuit.opened_until > now and not circuit.probing
+            if open_for is None:
+                if already_open or (not circuit.probing and circuit.failures < self.failure_threshold):
+                    return
+                open_for = self.reset_timeout
+            circuit.opened_until = max(circuit.opened_until, now + open_for)
+            circuit.probing = False
+        if not already_open:
+            print(f"{host} への失敗が続いたため、{open_for:.0f} 秒間リクエストを止めます")
+
+    def is_open(self, url):
+        """止めているホストかどうか"""
+        with self._lock:
+            circuit = self._circuits.get(_host(url))
+            return bool(circuit and circuit.opened_until and
+                        (circuit.opened_until > time.monotonic() or circuit.probing))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文字バイグラムによる記事の全文検索インデックス（ArticleStore と同じSQLiteに保存）
+
+形態素解析なしで日本語を扱えるよう、空白で区切った各部分を2文字ずつに分けて索引にする。
+各部分の末尾には終端記号を付けた1文字分の語も入れ、1文字の検索は前方一致で引く。
+検索語のバイグラムのうち含む記事が最も少ないものを候補にし、正規化したテキスト（search_documents）に
+部分文字列として含むかをSQLiteの instr() で確かめる。一致が多い検索語は新しい順に走査して
+必要な件数が揃ったところで止めるので、記事が数万件あっても数十ミリ秒で返せる。
+"""
+
+import re
+import unicodedata
+
+# 索引の対象にするフィールド
+SEARCH_FIELDS = ['title', 'h1', 'description', 'content_preview']
+
+_TERMINATOR = '\x00'
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    """全角・半角や大文字・小文字の違いをなくす"""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def document_text(article):
+    """索引と照合に使う記事のテキスト"""
+    return normalize('\n'.join(article.get(field) or '' for field in SEARCH_FIELDS))
+
+
+def bigrams(text):
+    """正規化済みテキストのバイグラム（各部分の末尾は終端記号付き）の集合"""
+    grams = set()
+    for run in _SPACES.split(text):
+        if not run:
+            continue
+        run += _TERMINATOR
+        grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+
+class SearchIndex:
+    """articles テーブルの id に対する転置インデックス（postings テーブル）"""
+
+    def __init__(self, conn, readonly=False):
+        self._conn = conn
+        if not readonly:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS postings (
+                    gram TEXT NOT NULL,
+                    article_id INTEGER NOT NULL,
+                    PRIMARY KEY (gram, article_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_article_id ON postings (article_id)")
+            # 照合用の正規化したテキスト（索引にある記事だけ）
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_documents (
+                    article_id INTEGER PRIMARY KEY,
+                    text TEXT NOT NULL
+                )
+            """)
+
+    def _has_table(self, name):
+        row = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return row is not None
+
+    def available(self):
+        """インデックスのテーブルがあるかどうか（古いデータベースでは読み取り専用だと作れない）"""
+        return self._has_table('postings')
+
+    def index_article(self, article_id, article):
+        """記事の索引を作り直す（コミットは呼び出し側で行う）"""
+        text = document_text(article)
+        self._conn.execute("DELETE FROM postings WHERE article_id = ?", (article_id,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO postings (gram, article_id) VALUES (?, ?)",
+            ((gram, article_id) for gram in bigrams(text)))
+        self._conn.execute("INSERT OR REPLACE INTO search_documents (article_id, text) VALUES (?, ?)",
+                           (article_id, text))
+
+    def remove_article(self, article_id):
+        """記事を索引から除く（コミットは呼び出し側で行う）"""
+        self._conn.execute("DELETE FROM postings WHERE article_id = ?", (article_id,))
+        self._conn.execute("DELETE FROM search_documents WHERE article_id = ?", (article_id,))
+
+    def needs_rebuild(self):
+        """記事はあるのに索引が空かどうか（この機能より前に作ったデータベース）"""
+        has_articles = self._conn.execute("SELECT 1 FROM articles LIMIT 1").fetchone()
+        has_postings = self._conn.execute("SELECT 1 FROM postings LIMIT 1").fetchone()
+        return bool(has_articles) and not has_postings
+
+    def needs_documents(self):
+        """索引はあるのに照合用のテキストがないかどうか（search_documents より前に作ったデータベース）"""
+        has_postings = self._conn.execute("SELECT 1 FROM postings LIMIT 1").fetchone()
+        has_documents = self._conn.execute("SELECT 1 FROM search_documents LIMIT 1").fetchone()
+        return bool(has_postings) and not has_documents
+
+    def fill_documents(self):
+        """索引にある記事の照合用テキストを作る（コミットは呼び出し側で行う）"""
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM articles "
+            "WHERE id IN (SELECT DISTINCT article_id FROM postings)").fetchall()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO search_documents (article_id, text) VALUES (?, ?)",
+            ((row[0], document_text(dict(zip(SEARCH_FIELDS, row[1:])))) for row in rows))
+        return len(rows)
+
+    def rebuild(self):
+        """全記事の索引を作り直す（コミットは呼び出し側で行う）"""
+        self._conn.execute("DELETE FROM postings")
+        self._conn.execute("DELETE FROM search_documents")
+        # ほぼ同じ内容の重複記事（duplicate_of のある記事）は索引に入れない
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM articles WHERE duplicate_of IS NULL").fetchall()
+        for row in rows:
+            self.index_article(row[0], dict(zip(SEARCH_FIELDS, row[1:])))
+        return len(rows)
+
+    def search(self, query, limit=50, offset=0):
+        """検索語をすべて含む記事の id を新しい順に返す（(id一覧, 総件数)）"""
+        terms = [term for term in _SPACES.split(normalize(query)) if term]
+        if not terms or not self.available():
+            return [], 0
+        if not self._has_table('search_documents'):
+            # 照合用のテキストがない古いデータベース（読み取り専用で開いた場合）
+            return self._search_postings(terms, limit, offset)
+
+        # 記事数（重複記事を除いた分の id に抜けがあるので上限の見積もり）
+        documents = self._conn.execute("SELECT MAX(article_id) FROM search_documents").fetchone()[0] or 0
+        # 2文字以上の語のバイグラムのうち、含む記事が最も少ないものの記事を候補にする
+        frequency, gram = documents, None
+        for term in terms:
+            for i in range(len(term) - 1):
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM postings WHERE gram = ?", (term[i:i + 2],)).fetchone()[0]
+                if count == 0:
+                    return [], 0
+                if count < frequency:
+                    frequency, gram = count, term[i:i + 2]
+
+        matches = ' AND '.join(['instr(d.text, ?) > 0'] * len(terms))
+        params = terms
+        if gram is not None and frequency * 2 <= documents:
+            # 候補が半分を超えるなら、候補を引くより全記事の照合の方が速い
+            matches = f"d.article_id IN (SELECT article_id FROM postings WHERE gram = ?) AND {matches}"
+            params = [gram] + terms
+        else:
+            frequency = documents
+        total = self._conn.execute(
+            f"SELECT COUNT(*) FROM search_documents d WHERE {matches}", params).fetchone()[0]
+        if offset >= total:
+            return [], total
+
+        # 一致する記事が多ければ、新しい順に走査して offset + limit 件目で止める方が候補を並べ替えるより速い
+        # （一致する記事が古い方に偏っていると走査が長くなるので、見積もりの4倍で比べる）
+        if frequency == documents or (offset + limit) * documents / total * 4 < frequency:
+            matches = ' AND '.join(['instr(d.text, ?) > 0'] * len(terms))
+            params = terms
+        rows = self._conn.execute(
+            "SELECT a.id FROM articles a JOIN search_documents d ON d.article_id = a.id "
+            f"WHERE {matches} ORDER BY a.sort_key DESC, a.id LIMIT ? OFFSET ?",
+            params + [limit, offset]).fetchall()
+        return [row[0] for row in rows], total
+
+    def _search_postings(self, terms, limit, offset):
+        """バイグラムをすべて含む記事を候補にし、Pythonで部分文字列として確かめる"""
+        conditions = []
+        params = []
+        for condition, condition_params in _gram_conditions(terms):
+            conditions.append(condition)
+            params.extend(condition_params)
+        candidates = ' INTERSECT '.join(conditions)
+
+        if all(len(term) <= 2 for term in terms):
+            # 2文字以下の語はバイグラム（前方一致）の一致がそのまま部分文字列の一致になる
+            total = self._conn.execute(f"SELECT COUNT(*) FROM ({candidates})", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT id FROM articles WHERE id IN ({candidates}) ORDER BY sort_key DESC, id LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+            return [row[0] for row in rows], total
+
+        rows = self._conn.execute(
+            f"SELECT id, {', '.join(SEARCH_FIELDS)} FROM articles "
+            f"WHERE id IN ({candidates}) ORDER BY sort_key DESC, id",
+            params).fetchall()
+
+        # バイグラムがすべて揃っていても連続しているとは限らないので、部分文字列として確かめる
+        matched = []
+        for row in rows:
+            text = document_text(dict(zip(SEARCH_FIELDS, row[1:])))
+            if all(term in text for term in terms):
+                matched.append(row[0])
+        return matched[offset:offset + limit], len(matched)
+
+
+def _gram_conditions(terms):
+    """検索語のバイグラムごとに、それを含む記事の id を返す副問い合わせと引数"""
+    seen = set()
+    for term in terms:
+        if len(term) == 1:
+            # 1文字はその文字で始まるバイグラムの前方一致（1つの記事に複数あるので記事ごとにまとめる）
+            grams = [(term, "SELECT DISTINCT article_id FROM postings WHERE gram >= ? AND gram < ?",
+                      [term, term + '\U0010ffff'])]
+        else:
+            grams = [(term[i:i + 2], "SELECT article_id FROM postings WHERE gram = ?", [term[i:i + 2]])
+                     for i in range(len(term) - 1)]
+        for key, condition, params in grams:
+            if key not in seen:
+                seen.add(key)
+                yield condition, params
@@ -13,51 +13,188 @@ from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import time
 import json
-import pandas as pd
+import hashlib
 from datetime import datetime
 import os
+from driver_pool import DriverPool, default_pool_size
+from browser_profile import BrowserProfile
+from page_waits import wait_for_ready_state, wait_for_selector, wait_for_network_idle, wait_for_scroll_growth
+
+# 投稿の要素を探すセレクター（Twitter風の例。最初に見つかったものを使用）
+POST_SELECTORS = [
+    '[data-testid="tweet"]',  # Twitter
+    '.post',                   # 一般的
+    '.tweet',                  # Twitter風
+    '[data-testid="post"]',    # Facebook風
+]
+
+# 投稿のテキスト・画像・リンク・タイムスタンプをブラウザ内でまとめて集めるスクリプト
+# （要素や属性ごとにWebDriverへ問い合わせると、投稿数×項目数の往復が発生するため）
+_EXTRACT_POSTS_JS = """
+const selectors = arguments[0];
+const maxPosts = arguments[1];
+const text = el => (el.innerText || '').trim();
+for (const selector of selectors) {
+    let elements;
+    try {
+        elements = document.querySelectorAll(selector);
+    } catch (e) {
+        continue;
+    }
+    if (!elements.length) continue;
+    const posts = Array.from(elements).slice(0, maxPosts).map(post => {
+        const times = post.querySelectorAll('time, [datetime]');
+        return {
+            texts: Array.from(post.querySelectorAll('p, span, div')).map(text).filter(t => t),
+            image_urls: Array.from(post.querySelectorAll('img')).map(img => img.src).filter(src => src),
+            links: Array.from(post.querySelectorAll('a')).map(a => a.href).filter(href => href),
+            timestamp: times.length ? (times[0].getAttribute('datetime') || text(times[0])) : null,
+        };
+    });
+    return {selector: selector, total: elements.length, posts: posts};
+}
+return null;
+"""
+
+# スクロールで読み込んだコンテンツの要素と、取得済みの要素に付ける目印の属性
+CONTENT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div']
+SEEN_ATTRIBUTE = 'data-scraper-seen'
+
+# 目印のない要素のテキストを取り出して目印を付けるスクリプト（前回のスクロール以降に増えた・中身が入った要素だけを返す）
+_NEW_CONTENT_JS = """
+const selector = arguments[0];
+const marker = arguments[1];
+const minLength = arguments[2];
+const items = [];
+for (const el of document.querySelectorAll(selector)) {
+    const text = (el.innerText || '').trim();
+    if (text.length > minLength) {
+        // 読み取った要素だけ印を付ける（まだ中身のないプレースホルダーは次のスクロールでまた読む）
+        el.setAttribute(marker, '');
+        items.push({tag: el.tagName.toLowerCase(), text: text});
+    }
+}
+return items;
+"""
 
 class SeleniumScraper:
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, driver=None, lightweight=True, keep_images=False, blocked_hosts=None):
         self.headless = headless
-        self.driver = None
-        self.setup_driver()
+        # テキストとリンクだけを読むので、画像・フォント・CSS・動画・広告の読み込みを止める
+        # （keep_images=True なら画像は読み込む。lightweight=False ですべて読み込む）
+        self.profile = BrowserProfile(keep_images=keep_images, blocked_hosts=blocked_hosts) if lightweight else None
+        # 直近のページで各待機に実際にかかった秒数
+        self.waits = {}
+        # driverを渡した場合（ドライバープールのワーカーなど）は新しく起動しない
+        self.driver = driver
+        if driver is None:
+            self.setup_driver()
+    
+    def _create_driver(self):
+        """Chromeドライバーを作成（失敗した場合は例外を送出）"""
+        chrome_options = Options()
+        
+        if self.headless:
+            chrome_options.add_argument('--headless')
+        
+        # その他のオプション
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--window-size=1920,1080')
+        chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+        
+        # 通信の完了を待てるよう、Networkイベントだけをパフォーマンスログに記録する
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+        
+        if self.profile:
+            self.profile.apply_options(chrome_options)
+        
+        # ドライバーを作成（要素が見つからないたびに待たされないよう implicitly_wait は使わない）
+        driver = webdriver.Chrome(options=chrome_options)
+        if self.profile:
+            self.profile.apply_cdp(driver)
+        return driver
     
     def setup_driver(self):
         """Chromeドライバーをセットアップ"""
         try:
-            chrome_options = Options()
-            
-            if self.headless:
-                chrome_options.add_argument('--headless')
-            
-            # その他のオプション
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            # ドライバーを作成
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.implicitly_wait(10)
-            
+            self.driver = self._create_driver()
             print("Chromeドライバーのセットアップが完了しました")
             
         except Exception as e:
             print(f"ドライバーのセットアップに失敗: {e}")
             print("ChromeDriverがインストールされているか確認してください")
     
+    def _record_wait(self, step, seconds):
+        """待機にかかった秒数を記録して表示"""
+        self.waits[step] = round(seconds, 3)
+        print(f"  待機 {step}: {seconds:.2f} 秒")
+    
+    def _wait_for_page(self, timeout, idle_time=0.5):
+        """ページの読み込み完了と通信の終了を待つ（合わせてtimeout秒まで）"""
+        start = time.monotonic()
+        self._record_wait('ready_state', wait_for_ready_state(self.driver, timeout))
+        remaining = max(timeout - (time.monotonic() - start), 0)
+        self._record_wait('network_idle', wait_for_network_idle(self.driver, idle_time, remaining))
+    
+    def create_pool(self, size=None, max_pages=50, max_memory_mb=1024):
+        """このスクレイパーと同じ設定のドライバーを事前起動したプールを作成"""
+        return DriverPool(self._create_driver, size=size, max_pages=max_pages, max_memory_mb=max_memory_mb)
+    
+    def scrape_many(self, urls, mode='dynamic', pool=None, workers=None, **kwargs):
+        """複数のURLをドライバープールで並列にスクレイピング（結果はurlsの順）
+        
+        mode は 'dynamic'（scrape_dynamic_content）または 'scroll'（scroll_and_scrape）。
+        kwargs はそれぞれのメソッドに渡す。poolを渡せば複数回の呼び出しでドライバーを使い回せる。
+        """
+        methods = {
+            'dynamic': SeleniumScraper.scrape_dynamic_content,
+            'scroll': SeleniumScraper.scroll_and_scrape,
+        }
+        if mode not in methods:
+            raise ValueError(f"未対応のモードです: {mode}")
+        method = methods[mode]
+        
+        def scrape(driver, url):
+            # プールのドライバーに結び付けたワーカーで処理する
+            worker = SeleniumScraper(self.headless, driver=driver, lightweight=False)
+            return method(worker, url, **kwargs)
+        
+        own_pool = pool is None
+        if own_pool:
+            pool = self.create_pool(size=workers or min(default_pool_size(), max(len(urls), 1)))
+        try:
+            print(f"{len(urls)} 件のURLを {pool.size} 台のドライバーで処理します")
+            return pool.map(scrape, urls)
+        finally:
+            if own_pool:
+                pool.close()
+    
+    def get_page(self, url, wait_time=5):
+        """JavaScriptの実行後のHTMLを取得（BasicScraper.get_page と同じく失敗したらNone）"""
+        try:
+            print(f"ブラウザで取得中: {url}")
+            self.waits = {}
+            self.driver.get(url)
+            self._wait_for_page(wait_time)
+            return self.driver.page_source
+        except Exception as e:
+            print(f"ページの取得に失敗: {e}")
+            return None
+    
     def scrape_dynamic_content(self, url, wait_time=5):
-        """動的コンテンツを含むページをスクレイピング"""
+        """動的コンテンツを含むページをスクレイピング（wait_timeは読み込みを待つ最大秒数）"""
         try:
             print(f"動的コンテンツをスクレイピング中: {url}")
+            self.waits = {}
             
             # ページにアクセス
             self.driver.get(url)
             
-            # ページの読み込みを待機
-            time.sleep(wait_time)
+            # ページの読み込みを待機（読み込みと通信が終われば待ち時間の途中でも進む）
+            self._wait_for_page(wait_time)
             
             # ページの基本情報を取得
             page_info = {
@@ -73,25 +210,31 @@ class SeleniumScraper:
             print(f"ページの取得に失敗: {e}")
             return None
     
-    def scrape_social_media_posts(self, url, max_posts=10):
-        """ソーシャルメディアの投稿をスクレイピング"""
+    def scrape_social_media_posts(self, url, max_posts=10, batch=True):
+        """ソーシャルメディアの投稿をスクレイピング
+        
+        batch=True ではページごとに1回のexecute_scriptで全投稿を抽出する
+        （False なら要素・属性ごとにWebDriverへ問い合わせる従来の方法）。
+        """
         try:
             print(f"ソーシャルメディアの投稿をスクレイピング中: {url}")
+            self.waits = {}
             
             self.driver.get(url)
-            time.sleep(5)  # 投稿の読み込みを待機
+            # 投稿の読み込みを待機（いずれかの投稿の要素が現れた時点で進む）
+            self._record_wait('ready_state', wait_for_ready_state(self.driver, 5, state='interactive'))
+            _, elapsed = wait_for_selector(self.driver, POST_SELECTORS, timeout=5)
+            self._record_wait('posts', elapsed)
             
-            posts = []
+            if batch:
+                posts = self._extract_posts_batch(max_posts)
+                if posts is not None:
+                    return posts
+                print("一括抽出に失敗したため、要素ごとに抽出します")
             
-            # 投稿の要素を探す（Twitter風の例）
-            post_selectors = [
-                '[data-testid="tweet"]',  # Twitter
-                '.post',                   # 一般的
-                '.tweet',                  # Twitter風
-                '[data-testid="post"]',    # Facebook風
-            ]
+            posts = []
             
-            for selector in post_selectors:
+            for selector in POST_SELECTORS:
                 try:
                     elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
                     if elements:
@@ -118,6 +261,32 @@ class SeleniumScraper:
             print(f"ソーシャルメディアのスクレイピングに失敗: {e}")
             return []
     
+    def _extract_posts_batch(self, max_posts):
+        """ブラウザ内で全投稿を一括抽出（_extract_post_data と同じ形式。失敗したらNone）"""
+        try:
+            result = self.driver.execute_script(_EXTRACT_POSTS_JS, POST_SELECTORS, max_posts)
+        except Exception as e:
+            print(f"投稿の一括抽出でエラー: {e}")
+            return None
+        if not result:
+            return []
+        
+        selector = result['selector']
+        print(f"セレクター '{selector}' で {result['total']} 件の要素を発見")
+        
+        posts = []
+        for item in result['posts']:
+            text_content = ' '.join(item['texts'])
+            posts.append({
+                'selector_type': selector,
+                'scraped_at': datetime.now().isoformat(),
+                'text_content': text_content[:500] + "..." if len(text_content) > 500 else text_content,
+                'image_urls': item['image_urls'],
+                'links': item['links'],
+                'timestamp': item['timestamp'] if item['timestamp'] is not None else "タイムスタンプなし",
+            })
+        return posts
+    
     def _extract_post_data(self, element, selector_type):
         """投稿要素からデータを抽出"""
         try:
@@ -167,15 +336,21 @@ class SeleniumScraper:
             print(f"投稿データの抽出でエラー: {e}")
             return None
     
-    def scroll_and_scrape(self, url, scroll_count=5, scroll_pause=2):
-        """ページをスクロールしながらスクレイピング"""
+    def scroll_and_scrape(self, url, scroll_count=5, scroll_pause=2, incremental=True):
+        """ページをスクロールしながらスクレイピング
+        
+        incremental=True では前回のスクロール以降に増えた要素だけを取得し、同じテキストは1度だけ返す
+        （False なら毎回ページ全体を取得し直す従来の方法）。
+        """
         try:
             print(f"スクロールしながらスクレイピング中: {url}")
+            self.waits = {}
             
             self.driver.get(url)
-            time.sleep(3)
+            self._wait_for_page(3)
             
             all_content = []
+            seen_texts = set()
             
             for i in range(scroll_count):
                 print(f"スクロール {i+1}/{scroll_count}")
@@ -186,14 +361,15 @@ class SeleniumScraper:
                 # ページの最下部までスクロール
                 self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
                 
-                # 新しいコンテンツの読み込みを待機
-                time.sleep(scroll_pause)
-                
-                # 新しい高さを取得
-                new_height = self.driver.execute_script("return document.body.scrollHeight")
+                # 新しいコンテンツの読み込みを待機（ページが伸びた時点で進む。scroll_pauseは最大秒数）
+                new_height, elapsed = wait_for_scroll_growth(self.driver, last_height, timeout=scroll_pause)
+                self._record_wait(f'scroll_{i+1}', elapsed)
                 
                 # 現在のページのコンテンツを取得
-                current_content = self._get_current_page_content()
+                if incremental:
+                    current_content = self._get_new_page_content(seen_texts)
+                else:
+                    current_content = self._get_current_page_content()
                 all_content.extend(current_content)
                 
                 # ページの高さが変わらなければ、これ以上スクロールできない
@@ -207,6 +383,31 @@ class SeleniumScraper:
             print(f"スクロールスクレイピングに失敗: {e}")
             return []
     
+    def _get_new_page_content(self, seen_texts):
+        """前回の取得以降に追加された要素のコンテンツを取得（seen_textsにあるテキストは除外）"""
+        try:
+            selector = ', '.join(f'{tag}:not([{SEEN_ATTRIBUTE}])' for tag in CONTENT_TAGS)
+            items = self.driver.execute_script(_NEW_CONTENT_JS, selector, SEEN_ATTRIBUTE, 10)
+            
+            content_list = []
+            for item in items or []:
+                # 入れ子のdivなどで同じテキストが繰り返されるので、テキストのハッシュで重複を除く
+                digest = hashlib.sha1(item['text'].encode('utf-8')).digest()
+                if digest in seen_texts:
+                    continue
+                seen_texts.add(digest)
+                content_list.append({
+                    'tag': item['tag'],
+                    'text': item['text'],
+                    'timestamp': datetime.now().isoformat()
+                })
+            
+            return content_list
+            
+        except Exception as e:
+            print(f"追加されたコンテンツの取得に失敗: {e}")
+            return []
+    
     def _get_current_page_content(self):
         """現在のページのコンテンツを取得"""
         try:
@@ -262,10 +463,16 @@ def main():
         scroll_content = scraper.scroll_and_scrape("https://example.com", scroll_count=3)
         print(f"スクロールで取得したコンテンツ数: {len(scroll_content)}")
         
+        # ドライバープールで複数ページを並列に処理する例
+        print("\n3. 複数ページの並列スクレイピング")
+        pages = scraper.scrape_many(["https://example.com", "https://example.org"], workers=2)
+        print(f"並列で取得したページ数: {sum(1 for p in pages if p)}")
+        
         # データを保存
         all_data = {
             'page_info': page_info,
             'scroll_content': scroll_content,
+            'pages': pages,
             'scraped_at': datetime.now().isoformat()
         }
         
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+スクレイピング対象サイトの設定ファイルと、複数のワーカーへの分割（シャーディング）
+
+設定ファイル（JSON）の形式:
+    {
+      "defaults": {"max_articles": 5},
+      "sites": [
+        {"url": "https://www.example.com/", "max_articles": 10,
+         "content_selectors": ["div.article-body", "main"],
+         "delay": 2.0, "article_hosts": ["news.example.com"]}
+      ]
+    }
+
+content_selectors を指定したサイトは、汎用のセレクターの候補を順に試す代わりにこれだけを使う。
+delay（秒）または rate（リクエスト/秒）はサイトのホストと article_hosts に適用する。
+"""
+
+import hashlib
+import json
+import os
+from urllib.parse import urlparse
+
+from article_extractor import parse_selector
+
+# 設定ファイルがない場合の対象サイト
+DEFAULT_SITES = [
+    {'url': "https://www.yahoo.co.jp/news/"},
+    {'url': "https://www.asahi.com/"},
+    {'url': "https://www.mainichi.jp/"},
+]
+
+DEFAULT_MAX_ARTICLES = 5
+
+# 設定できる項目
+SITE_KEYS = ('url', 'max_articles', 'content_selectors', 'delay', 'rate', 'article_hosts', 'enabled')
+
+# 分割の単位
+SHARD_MODES = ('site', 'url')
+
+
+def _host(url):
+    return urlparse(url).netloc.lower()
+
+
+class SiteConfig:
+    """1サイト分の設定"""
+
+    def __init__(self, url, max_articles=DEFAULT_MAX_ARTICLES, content_selectors=None,
+                 delay=None, rate=None, article_hosts=None, enabled=True):
+        if not url:
+            raise ValueError("サイトの url がありません")
+        for selector in content_selectors or ():
+            if parse_selector(selector) is None:
+                raise ValueError(f"サポートしていないセレクター: {selector}（{url}）")
+        self.url = url
+        self.max_articles = int(max_articles)
+        self.content_selectors = list(content_selectors) if content_selectors else None
+        self.delay = delay
+        self.rate = rate
+        self.article_hosts = [host.lower() for host in article_hosts or ()]
+        self.enabled = enabled
+
+    @property
+    def host(self):
+        return _host(self.url)
+
+    @property
+    def hosts(self):
+        """設定を適用するホスト（サイト自身と記事のホスト）"""
+        return [self.host] + [host for host in self.article_hosts if host != self.host]
+
+    @classmethod
+    def from_dict(cls, data, defaults=None):
+        merged = {**(defaults or {}), **data}
+        unknown = set(merged) - set(SITE_KEYS)
+        if unknown:
+            raise ValueError(f"不明な設定項目: {', '.join(sorted(unknown))}（{merged.get('url')}）")
+        return cls(**merged)
+
+    def __repr__(self):
+        return f"SiteConfig({self.url!r}, max_articles={self.max_articles})"
+
+
+def load_sites(path='sites.json'):
+    """設定ファイルから有効なサイトの一覧を読み込む（ファイルがなければ DEFAULT_SITES）"""
+    if not path or not os.path.exists(path):
+        if path:
+            print(f"設定ファイル {path} がないため、既定のサイトを使います")
+        return [SiteConfig.from_dict(site) for site in DEFAULT_SITES]
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {'sites': data}
+    defaults = data.get('defaults', {})
+    sites = [SiteConfig.from_dict(site, defaults) for site in data.get('sites', [])]
+    return [site for site in sites if site.enabled]
+
+
+def shard_of(key, count):
+    """キーを count 個のシャードのどれかに割り当てる（実行環境が変わっても同じ結果になるハッシュ）"""
+    digest = hashlib.sha1(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+
+class Shard:
+    """全体を count 個に分けたうちの index 番目（0始まり）
+
+    mode='site' はサイトのホスト単位で分ける（同じホストは常に同じシャードなので、
+    ホストごとの間隔がワーカーをまたいでも守られる）。mode='url' は全シャードがトップページを読み、
+    記事のURL単位で分ける（サイトが少ないときに偏らない）。
+    """
+
+    def __init__(self, index, count, mode='site'):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"シャードの指定が不正です: {index}/{count}")
+        if mode not in SHARD_MODES:
+            raise ValueError(f"不明な分割の単位: {mode}")
+        self.index = index
+        self.count = count
+        self.mode = mode
+
+    @classmethod
+    def parse(cls, text, mode='site'):
+        """「i/n」形式の文字列から作る"""
+        try:
+            index, count = (int(part) for part in text.split('/'))
+        except ValueError:
+            raise ValueError(f"シャードは i/n の形式で指定してください: {text}")
+        return cls(index, count, mode)
+
+    def owns(self, key):
+        """キー（ホストまたはURL）がこのシャードの担当ならTrue"""
+        return shard_of(key, self.count) == self.index
+
+    def select_sites(self, sites):
+        """このシャードが担当するサイト（mode='url' ならすべて）"""
+        if self.mode != 'site':
+            return list(sites)
+        return [site for site in sites if self.owns(site.host)]
+
+    def owns_url(self, url):
+        """記事のURLがこのシャードの担当ならTrue（mode='site' なら常にTrue）"""
+        return self.mode != 'url' or self.owns(url)
+
+    def max_articles(self, count):
+        """mode='url' では1サイトの記事数をシャードの数で分ける"""
+        if self.mode != 'url':
+            return count
+        return -(-count // self.count)
+
+    def path(self, path):
+        """出力ファイル名にシャードの番号を付ける（news_articles.jsonl → news_articles.shard-0-of-3.jsonl）"""
+        base, ext = os.path.splitext(path)
+        return f"{base}.shard-{self.index}-of-{self.count}{ext}"
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
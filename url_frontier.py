@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記事リンクの正規化・重複除去・優先順位付けを行うフロンティア
+"""
+
+import threading
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# 記事の中身に関係しない計測用のクエリパラメーター
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', '_ga', 'igshid',
+])
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def canonicalize_url(url):
+    """URLを正規化（http/https以外はNone）
+
+    スキームとホストを小文字にし、既定のポート・末尾のドット・フラグメント・
+    utm_* などの計測用パラメーターを取り除く。
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    if ':' in host:  # IPv6
+        host = f'[{host}]'
+    if port and port != _DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+
+    query = parts.query
+    params = parse_qsl(query, keep_blank_values=True)
+    if any(_is_tracking_param(k) for k, _ in params):
+        # 計測用パラメーターを含む場合だけ組み立て直す（それ以外は元の表記を保つ）
+        query = urlencode([(k, v) for k, v in params if not _is_tracking_param(k)])
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+def resolve_link(base_url, href):
+    """リンクをページのURLを基準に絶対URLにして正規化（記事にならないリンクはNone）"""
+    if not href:
+        return None
+    href = href.strip()
+    if href.startswith('#'):
+        return None
+    return canonicalize_url(urljoin(base_url, href))
+
+
+class URLFrontier:
+    """全サイト共通で取得済みURLを管理し、候補を優先度順に並べる"""
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def is_seen(self, url):
+        """取得済み（または取得中）かどうか"""
+        return url in self._seen
+
+    def claim(self, url):
+        """未取得なら取得済みにしてTrueを返す（他のサイトと同じ記事を二重に取得しない）"""
+        with self._lock:
+            if url in self._seen:
+                return False
+            self._seen.add(url)
+            return True
+
+    def prioritize(self, scored_urls):
+        """(正規化済みURL, スコア) の一覧から重複と取得済みを除き、スコアの高い順に並べる
+
+        同じスコアの場合はページ内の出現順を保つ。
+        """
+        scores = {}
+        for url, score in scored_urls:
+            if url in self._seen:
+                continue
+            if url not in scores or score > scores[url]:
+                scores[url] = score
+        return sorted(scores, key=lambda url: -scores[url])
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同梱のUser-Agent一覧とローテーション
+
+fake_useragent.UserAgent() は起動のたびに大きなデータを読み込み、環境によっては通信も発生する。
+ここではよく使われるデスクトップブラウザのUser-Agentを定数として持ち、読み込みの時間をかけない。
+"""
+
+import random
+import threading
+import zlib
+from urllib.parse import urlparse
+
+# 主要なデスクトップブラウザのUser-Agent
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Safari/605.1.15',
+)
+
+# ローテーションの方式
+POLICIES = ('per_host', 'round_robin', 'random', 'fixed')
+
+
+class UserAgentPool:
+    """User-Agentを方式に従って選ぶ
+
+    per_host    : ホストごとに常に同じUser-Agent（同じサイトでは途中で変わらない）
+    round_robin : 呼び出すたびに順番に切り替える
+    random      : 呼び出すたびに無作為に選ぶ
+    fixed       : 最初に選んだ1つを使い続ける
+    """
+
+    def __init__(self, agents=None, policy='per_host', seed=None):
+        if policy not in POLICIES:
+            raise ValueError(f"未対応のローテーション方式です: {policy}")
+        self.agents = list(agents or USER_AGENTS)
+        if not self.agents:
+            raise ValueError("User-Agentが空です")
+        self.policy = policy
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_index = 0
+        self._fixed = self._random.choice(self.agents)
+
+    @property
+    def random(self):
+        """無作為に1つ選ぶ（fake_useragent.UserAgent().random と同じ使い方）"""
+        with self._lock:
+            return self._random.choice(self.agents)
+
+    def get(self, url=None):
+        """方式に従ってUser-Agentを1つ返す（per_host ではurlのホストで決まる）"""
+        if self.policy == 'fixed':
+            return self._fixed
+        if self.policy == 'random':
+            return self.random
+        if self.policy == 'round_robin':
+            with self._lock:
+                agent = self.agents[self._next_index % len(self.agents)]
+                self._next_index += 1
+            return agent
+        host = urlparse(url).netloc.lower() if url else ''
+        if not host:
+            return self._fixed
+        # 実行ごとに変わらないよう、組み込みのhash()ではなくcrc32で割り当てる
+        return self.agents[zlib.crc32(host.encode('utf-8')) % len(self.agents)]